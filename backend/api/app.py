@@ -1,24 +1,24 @@
 from flask import Flask, request, jsonify
 from flask_cors import CORS
-import pandas as pd
-import sqlite3
 import jwt
 from functools import wraps
-import pytz
-from datetime import datetime
-from backend.models.recommendation_function import recommend_articles_bias_controlled
+import os
+from backend.api.database import ConnectionPool
+from backend.api.recommendation_jobs import JobDispatcher, JobQueue
 
 app = Flask(__name__)
 CORS(app)
 
 SECRET_KEY = "secret_key"
 
-# Load POLUSA dataset
-polusa_balanced = pd.read_csv("backend/data/polusa_balanced.csv", header=0)
+# Pooled SQLite connections (WAL mode), shared by the request threads of this worker
+DB_POOL_SIZE = 8
+db_pool = ConnectionPool("backend/db/database.db", size=DB_POOL_SIZE)
 
-# Minimum seconds to consider "interested"
-READ_TIME_INTERESTED = 120
-READ_TIME_NOT_INTERESTED = 30
+# Recommendations are generated asynchronously by the worker tier (`python -m backend.api.recommendation_jobs`),
+# this API only enqueues jobs and reports their status. Only the development server below starts workers in-process:
+# under gunicorn (or any other WSGI server) the worker tier must run as its own process, or jobs stay queued.
+job_queue = JobQueue(db_pool)
 
 def verify_token(func):
     @wraps(func)
@@ -39,7 +39,8 @@ def verify_token(func):
         return func(*args, **kwargs)
     return wrapper
 
-# Generates personalized recommendations based on user's interactions
+# Enqueues the generation of personalized recommendations based on user's interactions.
+# Jobs of the same user are coalesced; poll `/recommendations/jobs/<job_id>` for the result.
 @app.route("/recommendations", methods=["POST"])
 @verify_token
 def generate_recommendations():
@@ -47,106 +48,47 @@ def generate_recommendations():
     if not user_id:
         return jsonify({"error": "User ID missing in token"}), 403
 
-    conn = sqlite3.connect("backend/db/database.db")
-    cursor = conn.cursor()
-
     try:
-        # Get the last recommendation request timestamp
-        cursor.execute("SELECT last_recommendation_timestamp FROM users WHERE id = ?", (user_id,))
-        last_recommendation_time = cursor.fetchone()
-        last_recommendation_time = last_recommendation_time[0] if last_recommendation_time and last_recommendation_time[0] else None
-
-        if last_recommendation_time:
-            cursor.execute("""
-                SELECT id, interaction_type, read_time_seconds 
-                FROM interactions 
-                WHERE user_id = ? AND interaction_timestamp > ?
-            """, (user_id, last_recommendation_time))
-        else:
-            cursor.execute("""
-                SELECT id, interaction_type, read_time_seconds 
-                FROM interactions 
-                WHERE user_id = ?
-            """, (user_id,))
-
-        interactions = cursor.fetchall()
-        recommendations = []
-
-        for article_id, interaction_type, read_time_seconds in interactions:
-            if interaction_type == "like":
-                interaction_type_final = "like"
-            elif interaction_type == "read" and read_time_seconds >= READ_TIME_INTERESTED:
-                interaction_type_final = "read"
-            elif interaction_type == "dislike" or read_time_seconds < READ_TIME_NOT_INTERESTED:
-                interaction_type_final = "dislike"
-            else:
-                continue
-
-            cursor.execute("SELECT headline, outlet FROM news_articles WHERE id = ?", (article_id,))
-            row = cursor.fetchone()
-            if row:
-                source_headline, source_outlet = row
-            else:
-                source_headline = "An article you engaged with"
-                source_outlet = "An unknown source"
-
-            recommended_articles = recommend_articles_bias_controlled(article_id, polusa_balanced)
-
-            if recommended_articles is not None:
-                for _, rec in recommended_articles.iterrows():
-                    recommendations.append({
-                        "id": int(rec["id"]),
-                        "interaction_type": interaction_type_final,
-                        "source_article_id": article_id,
-                        "source_article_headline": source_headline,
-                        "source_article_outlet": source_outlet,
-                        "date_publish": rec["date_publish"],
-                        "headline": rec["headline"],
-                        "outlet": rec["outlet"],
-                        "url": rec["url"],
-                        "political_leaning": rec["political_leaning"]
-                    })
+        job_id = job_queue.enqueue(user_id, "generate")
+        return jsonify({"success": True, "job_id": job_id, "status": "queued"}), 202
 
-        for rec in recommendations:
-            # Check if the recommendation already exists
-            cursor.execute("""
-                SELECT 1 FROM recommendations
-                WHERE user_id = ? AND id = ?
-            """, (user_id, rec["id"]))
-            
-            exists = cursor.fetchone()
-            if exists:
-                continue  # Skip if already exists
-
-            # If not exists, insert the recommendation
-            cursor.execute("""
-                INSERT INTO recommendations (
-                    id, user_id, interaction_type, source_article_id,
-                    source_article_headline, date_publish, headline, outlet, url, political_leaning
-                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            """, (
-                rec["id"], user_id, rec["interaction_type"], rec["source_article_id"],
-                rec["source_article_headline"], rec["date_publish"], rec["headline"],
-                rec["outlet"], rec["url"], rec["political_leaning"]
-            ))
-
-        # Update last recommendation request time
-        local_time = datetime.now(pytz.timezone('Europe/Madrid')).strftime('%Y-%m-%d %H:%M:%S')
-        cursor.execute("UPDATE users SET last_recommendation_timestamp = ? WHERE id = ?",(local_time, user_id))
-
-        conn.commit()
-
-        return jsonify({
-            "success": True,
-            "recommendations": [r for r in recommendations if r["interaction_type"] in ("like", "read")]
-        })
-    
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
-    finally:
-        cursor.close()
-        conn.close()
+# Status of a recommendation job, with the generated recommendations once it is done
+@app.route("/recommendations/jobs/<int:job_id>", methods=["GET"])
+@verify_token
+def get_recommendation_job(job_id):
+    job = job_queue.get(job_id)
+    if job is None or (job["user_id"] != request.user.get("id") and request.user.get("role") != "admin"):
+        return jsonify({"error": "Job not found"}), 404
+
+    response = {"job_id": job["id"], "kind": job["kind"], "status": job["status"]}
+    if job["status"] == "done" and job["kind"] == "generate":
+        response["success"] = True
+        response["recommendations"] = job["result"]
+    elif job["status"] == "failed":
+        response["error"] = job["error"]
+    return jsonify(response)
+
+# Exposes recommendation cache counters (hits, misses, evictions in memory & on disk) summed over the worker processes, for sizing the cache
+@app.route("/recommendations/cache-stats", methods=["GET"])
+@verify_token
+def recommendation_cache_stats():
+    if request.user.get("role") != "admin":
+        return jsonify({"error": "Admin access required"}), 403
+
+    workers = job_queue.worker_stats()
+    totals = {name: sum(stats.get(name, 0) for stats in workers) for name in ("hits", "disk_hits", "misses", "evictions", "expirations", "disk_evictions", "disk_expirations", "entries")}
+    lookups = totals["hits"] + totals["disk_hits"] + totals["misses"]
+    totals["hit_rate"] = (totals["hits"] + totals["disk_hits"]) / lookups if lookups else 0.0
+    return jsonify({"workers": workers, "totals": totals})
 
 if __name__ == "__main__":
+    # Development server: run the worker tier in-process
+    dispatcher = JobDispatcher(
+        job_queue,
+        workers=int(os.environ.get("RECOMMENDATION_WORKERS", 2)),
+        config={"threads_per_worker": int(os.environ.get("RECOMMENDATION_THREADS_PER_WORKER", 1))},
+    ).start()
     app.run(host="0.0.0.0", port=5002)
@@ -0,0 +1,130 @@
+import queue
+import sqlite3
+from contextlib import contextmanager
+
+# SQLite caps the number of bound parameters per statement (999 on older builds)
+MAX_QUERY_PARAMETERS = 900
+
+PRAGMAS = {
+    "journal_mode": "WAL",      # Readers never block the writer and vice versa
+    "synchronous": "NORMAL",    # Safe with WAL, avoids an fsync per commit
+    "temp_store": "MEMORY",
+    "cache_size": -20_000,      # ~20 MB page cache per connection
+}
+
+# Fixed-size pool of autocommit SQLite connections with WAL mode and tuned pragmas.
+# Reads run outside transactions; writes go through `write_transaction`, one short transaction per request.
+class ConnectionPool:
+    def __init__(self, db_path, size = 8, busy_timeout_ms = 5_000):
+        self.db_path = db_path
+        self.size = size
+        self.busy_timeout_ms = busy_timeout_ms
+        self._connections = queue.LifoQueue(maxsize = size)
+        for _ in range(size):
+            self._connections.put(self._connect())
+
+        # Serves the per-user duplicate check; skipped if the schema has not been created yet
+        with self.connection() as conn:
+            try:
+                conn.execute("CREATE INDEX IF NOT EXISTS idx_recommendations_user_id ON recommendations (user_id, id)")
+            except sqlite3.OperationalError:
+                pass
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout = self.busy_timeout_ms / 1000, isolation_level = None, check_same_thread = False)
+        conn.execute(f"PRAGMA busy_timeout = {int(self.busy_timeout_ms)}")
+        for name, value in PRAGMAS.items():
+            conn.execute(f"PRAGMA {name} = {value}")
+        return conn
+
+    @contextmanager
+    def connection(self):
+        conn = self._connections.get()
+        try:
+            yield conn
+        finally:
+            if conn.in_transaction:
+                conn.rollback()
+            self._connections.put(conn)
+
+    # Takes the write lock up front (BEGIN IMMEDIATE), so the transaction never has to upgrade from a read lock
+    @contextmanager
+    def write_transaction(self):
+        with self.connection() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+            except BaseException:
+                conn.rollback()
+                raise
+            conn.commit()
+
+    def close(self):
+        while not self._connections.empty():
+            self._connections.get_nowait().close()
+
+def chunks(values, size = MAX_QUERY_PARAMETERS):
+    values = list(values)
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
+
+def get_last_recommendation_time(conn, user_id):
+    row = conn.execute("SELECT last_recommendation_timestamp FROM users WHERE id = ?", (user_id,)).fetchone()
+    return row[0] if row and row[0] else None
+
+def get_new_interactions(conn, user_id, since = None):
+    if since:
+        return conn.execute("""
+            SELECT id, interaction_type, read_time_seconds
+            FROM interactions
+            WHERE user_id = ? AND interaction_timestamp > ?
+        """, (user_id, since)).fetchall()
+    return conn.execute("""
+        SELECT id, interaction_type, read_time_seconds
+        FROM interactions
+        WHERE user_id = ?
+    """, (user_id,)).fetchall()
+
+# Headline & outlet of several articles with batched IN (...) lookups: {id: (headline, outlet)}
+def get_article_sources(conn, article_ids):
+    sources = {}
+    for chunk in chunks(dict.fromkeys(article_ids)):
+        placeholders = ", ".join("?" * len(chunk))
+        rows = conn.execute(f"SELECT id, headline, outlet FROM news_articles WHERE id IN ({placeholders})", chunk)
+        for article_id, headline, outlet in rows:
+            sources[article_id] = (headline, outlet)
+    return sources
+
+# Ids among `article_ids` already recommended to the user
+def get_recommended_ids(conn, user_id, article_ids):
+    existing = set()
+    for chunk in chunks(dict.fromkeys(article_ids)):
+        placeholders = ", ".join("?" * len(chunk))
+        rows = conn.execute(f"SELECT id FROM recommendations WHERE user_id = ? AND id IN ({placeholders})", [user_id, *chunk])
+        existing.update(article_id for article_id, in rows)
+    return existing
+
+# Inserts the recommendations the user has not received yet (first occurrence wins) with a single executemany,
+# then records the request time. Must run inside `ConnectionPool.write_transaction`.
+def save_recommendations(conn, user_id, recommendations, timestamp):
+    existing = get_recommended_ids(conn, user_id, [rec["id"] for rec in recommendations])
+
+    rows = []
+    for rec in recommendations:
+        if rec["id"] in existing:
+            continue
+        existing.add(rec["id"])
+        rows.append((
+            rec["id"], user_id, rec["interaction_type"], rec["source_article_id"],
+            rec["source_article_headline"], rec["date_publish"], rec["headline"],
+            rec["outlet"], rec["url"], rec["political_leaning"]
+        ))
+
+    conn.executemany("""
+        INSERT INTO recommendations (
+            id, user_id, interaction_type, source_article_id,
+            source_article_headline, date_publish, headline, outlet, url, political_leaning
+        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    """, rows)
+    conn.execute("UPDATE users SET last_recommendation_timestamp = ? WHERE id = ?", (timestamp, user_id))
+    return len(rows)
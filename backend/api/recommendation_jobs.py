@@ -0,0 +1,311 @@
+import os
+import json
+import time
+import argparse
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from threadpoolctl import threadpool_limits
+from backend.api.database import ConnectionPool
+
+JOB_KINDS = ("generate", "warm")
+
+DEFAULT_CONFIG = {
+    "db_path": "backend/db/database.db",
+    "store_dir": "backend/data/article_store",
+    "index_dir": "backend/data/tfidf_index",
+    "cache_db_path": "backend/data/recommendation_cache.db",
+    "cache_size": 10_000,
+    "cache_disk_size": 100_000,
+    "cache_ttl_seconds": 24 * 3600,
+    "threads_per_worker": 1,
+    "retriever": "exact",  # "exact", "dense" or "ann" (see backend.models.retrieval)
+    "dense_dir": "backend/data/dense_index",
+    "ann": "ivf",
+    "nprobe": 16,
+    "ef_search": 128,
+    "ann_exact_below": 5_000,
+}
+
+# Finished jobs (and the cache counters of workers that stopped reporting) are kept this long, then purged
+JOB_RETENTION_SECONDS = 24 * 3600
+
+# How often a running dispatcher purges them
+JOB_PURGE_INTERVAL_SECONDS = 10 * 60
+
+# SQLite-backed queue of per-user recommendation jobs, stored next to the app tables so the Node API can enqueue
+# too. At most one job per (user, kind) is queued at a time: enqueueing again returns the queued job (coalescing).
+class JobQueue:
+    def __init__(self, db_pool):
+        self.db_pool = db_pool
+        with db_pool.write_transaction() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS recommendation_jobs (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    user_id INTEGER NOT NULL,
+                    kind TEXT NOT NULL DEFAULT 'generate',
+                    status TEXT NOT NULL DEFAULT 'queued',
+                    created_at REAL NOT NULL,
+                    started_at REAL,
+                    finished_at REAL,
+                    result TEXT,
+                    error TEXT
+                )
+            """)
+            conn.execute("""
+                CREATE UNIQUE INDEX IF NOT EXISTS idx_recommendation_jobs_queued
+                ON recommendation_jobs (user_id, kind) WHERE status = 'queued'
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_recommendation_jobs_status ON recommendation_jobs (status, user_id)")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS recommendation_worker_stats (
+                    pid INTEGER PRIMARY KEY,
+                    stats TEXT NOT NULL,
+                    updated_at REAL NOT NULL
+                )
+            """)
+
+    def enqueue(self, user_id, kind = "generate"):
+        if kind not in JOB_KINDS:
+            raise ValueError(f"Unknown job kind: {kind}")
+        with self.db_pool.write_transaction() as conn:
+            conn.execute(
+                "INSERT OR IGNORE INTO recommendation_jobs (user_id, kind, status, created_at) VALUES (?, ?, 'queued', ?)",
+                (user_id, kind, time.time()),
+            )
+            row = conn.execute(
+                "SELECT id FROM recommendation_jobs WHERE user_id = ? AND kind = ? AND status = 'queued'", (user_id, kind)
+            ).fetchone()
+        return row[0]
+
+    def get(self, job_id):
+        with self.db_pool.connection() as conn:
+            row = conn.execute("""
+                SELECT id, user_id, kind, status, created_at, started_at, finished_at, result, error
+                FROM recommendation_jobs WHERE id = ?
+            """, (job_id,)).fetchone()
+        if row is None:
+            return None
+        job = dict(zip(("id", "user_id", "kind", "status", "created_at", "started_at", "finished_at", "result", "error"), row))
+        job["result"] = json.loads(job["result"]) if job["result"] else None
+        return job
+
+    # Marks the next runnable job as running & returns it (generate jobs first, one running job per user)
+    def claim(self):
+        with self.db_pool.write_transaction() as conn:
+            row = conn.execute("""
+                SELECT id, user_id, kind FROM recommendation_jobs AS queued
+                WHERE status = 'queued' AND NOT EXISTS (
+                    SELECT 1 FROM recommendation_jobs AS running
+                    WHERE running.user_id = queued.user_id AND running.status = 'running'
+                )
+                ORDER BY kind = 'generate' DESC, id
+                LIMIT 1
+            """).fetchone()
+            if row is None:
+                return None
+            conn.execute("UPDATE recommendation_jobs SET status = 'running', started_at = ? WHERE id = ?", (time.time(), row[0]))
+        return {"id": row[0], "user_id": row[1], "kind": row[2]}
+
+    def finish(self, job_id, result):
+        with self.db_pool.write_transaction() as conn:
+            conn.execute(
+                "UPDATE recommendation_jobs SET status = 'done', finished_at = ?, result = ? WHERE id = ?",
+                (time.time(), json.dumps(result), job_id),
+            )
+
+    def fail(self, job_id, error):
+        with self.db_pool.write_transaction() as conn:
+            conn.execute(
+                "UPDATE recommendation_jobs SET status = 'failed', finished_at = ?, error = ? WHERE id = ?",
+                (time.time(), str(error), job_id),
+            )
+
+    # Requeues jobs left running by a crashed dispatcher & purges old finished jobs and all worker stats
+    def recover(self):
+        with self.db_pool.write_transaction() as conn:
+            conn.execute("DELETE FROM recommendation_worker_stats")
+            running = conn.execute("SELECT id, user_id, kind FROM recommendation_jobs WHERE status = 'running'").fetchall()
+            for job_id, user_id, kind in running:
+                queued = conn.execute(
+                    "SELECT 1 FROM recommendation_jobs WHERE user_id = ? AND kind = ? AND status = 'queued'", (user_id, kind)
+                ).fetchone()
+                if queued:
+                    conn.execute("UPDATE recommendation_jobs SET status = 'failed', error = 'Superseded after restart' WHERE id = ?", (job_id,))
+                else:
+                    conn.execute("UPDATE recommendation_jobs SET status = 'queued', started_at = NULL WHERE id = ?", (job_id,))
+        self.purge()
+
+    # Deletes finished jobs & worker stats older than JOB_RETENTION_SECONDS, returning the number of jobs deleted
+    def purge(self):
+        expired = time.time() - JOB_RETENTION_SECONDS
+        with self.db_pool.write_transaction() as conn:
+            deleted = conn.execute(
+                "DELETE FROM recommendation_jobs WHERE status IN ('done', 'failed') AND finished_at < ?", (expired,)
+            ).rowcount
+            conn.execute("DELETE FROM recommendation_worker_stats WHERE updated_at < ?", (expired,))
+        return deleted
+
+    def record_worker_stats(self, pid, stats):
+        with self.db_pool.write_transaction() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO recommendation_worker_stats (pid, stats, updated_at) VALUES (?, ?, ?)",
+                (pid, json.dumps(stats), time.time()),
+            )
+
+    def worker_stats(self):
+        with self.db_pool.connection() as conn:
+            rows = conn.execute("SELECT stats FROM recommendation_worker_stats").fetchall()
+        return [json.loads(stats) for stats, in rows]
+
+# Per-process state of the worker tier: each worker process loads the article store, the index & the cache once
+_worker = {}
+
+def init_worker(config):
+    from backend.models.article_store import load_article_store
+    from backend.models.tfidf_index import load_tfidf_index
+    from backend.models.recommendation_cache import RecommendationCache, dataset_version
+    from backend.models.retrieval import load_retriever
+
+    # Thread budget: keep BLAS/OpenMP pools of concurrent workers from oversubscribing the cores
+    _worker["threadpool_limits"] = threadpool_limits(limits = config["threads_per_worker"])
+
+    store = load_article_store(config["store_dir"])
+    tfidf_index = load_tfidf_index(config["index_dir"])
+    if not tfidf_index.matches(store):
+        raise RuntimeError("TF-IDF index is out of date with the article store, rebuild it with `python -m backend.models.tfidf_index`")
+
+    _worker["store"] = store
+    _worker["tfidf_index"] = tfidf_index
+    _worker["retriever"] = load_retriever(
+        tfidf_index, config["retriever"], config["dense_dir"], ann = config["ann"],
+        nprobe = config["nprobe"], ef_search = config["ef_search"], exact_below = config["ann_exact_below"],
+    )
+    _worker["db_pool"] = ConnectionPool(config["db_path"], size = 1)
+    _worker["cache"] = RecommendationCache(
+        dataset_version(store, tfidf_index),
+        max_entries = config["cache_size"],
+        max_disk_entries = config["cache_disk_size"],
+        ttl_seconds = config["cache_ttl_seconds"],
+        db_path = config["cache_db_path"],
+    )
+
+def run_job(job):
+    from backend.api.recommendations import generate_user_recommendations, warm_user_recommendations
+
+    run = generate_user_recommendations if job["kind"] == "generate" else warm_user_recommendations
+    result = run(_worker["db_pool"], _worker["cache"], _worker["store"], _worker["tfidf_index"], job["user_id"], retriever = _worker["retriever"])
+    return result, os.getpid(), _worker["cache"].stats()
+
+# Claims queued jobs and runs them on a bounded pool of worker processes (at most `workers` jobs in flight)
+class JobDispatcher:
+    def __init__(self, job_queue, workers = 2, config = None, poll_interval = 0.2):
+        self.job_queue = job_queue
+        self.workers = workers
+        self.config = {**DEFAULT_CONFIG, **(config or {})}
+        self.poll_interval = poll_interval
+        self._slots = threading.BoundedSemaphore(workers)
+        self._stop = threading.Event()
+        self._thread = None
+        self._executor = None
+        self._next_purge = time.monotonic() + JOB_PURGE_INTERVAL_SECONDS
+
+    def _new_executor(self):
+        return ProcessPoolExecutor(
+            max_workers = self.workers,
+            mp_context = multiprocessing.get_context("spawn"),
+            initializer = init_worker,
+            initargs = (self.config,),
+        )
+
+    def start(self):
+        self.job_queue.recover()
+        self._executor = self._new_executor()
+        self._thread = threading.Thread(target = self._run, name = "recommendation-job-dispatcher", daemon = True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        if self._executor is not None:
+            self._executor.shutdown(wait = True)
+
+    def _run(self):
+        while not self._stop.is_set():
+            # Every interaction enqueues a warm job: purge finished ones while the tier stays up, not only at start
+            if time.monotonic() >= self._next_purge:
+                self.job_queue.purge()
+                self._next_purge = time.monotonic() + JOB_PURGE_INTERVAL_SECONDS
+            if not self._slots.acquire(timeout = self.poll_interval):
+                continue
+            job = self.job_queue.claim()
+            if job is None:
+                self._slots.release()
+                self._stop.wait(self.poll_interval)
+                continue
+            try:
+                future = self._executor.submit(run_job, job)
+            except BrokenProcessPool as e:
+                # A worker process died (or failed to initialize): fail the job and start a fresh pool
+                self.job_queue.fail(job["id"], e)
+                self._slots.release()
+                self._executor.shutdown(wait = False)
+                self._executor = self._new_executor()
+                self._stop.wait(self.poll_interval)
+                continue
+            future.add_done_callback(lambda future, job = job: self._done(job, future))
+
+    def _done(self, job, future):
+        try:
+            result, pid, cache_stats = future.result()
+            self.job_queue.finish(job["id"], result)
+            self.job_queue.record_worker_stats(pid, cache_stats)
+        except Exception as e:
+            self.job_queue.fail(job["id"], e)
+        finally:
+            self._slots.release()
+
+def main():
+    parser = argparse.ArgumentParser(description = "Run the recommendation worker tier.")
+    parser.add_argument("--workers", type = int, default = int(os.environ.get("RECOMMENDATION_WORKERS", 2)))
+    parser.add_argument("--threads-per-worker", type = int, default = int(os.environ.get("RECOMMENDATION_THREADS_PER_WORKER", 1)))
+    parser.add_argument("--db", default = DEFAULT_CONFIG["db_path"])
+    parser.add_argument("--store", default = DEFAULT_CONFIG["store_dir"])
+    parser.add_argument("--index", default = DEFAULT_CONFIG["index_dir"])
+    parser.add_argument("--cache-db", default = DEFAULT_CONFIG["cache_db_path"])
+    parser.add_argument("--cache-disk-size", type = int, default = DEFAULT_CONFIG["cache_disk_size"], help = "Maximum rows of the shared SQLite cache")
+    parser.add_argument("--retriever", choices = ["exact", "dense", "ann"], default = os.environ.get("RECOMMENDATION_RETRIEVER", "exact"))
+    parser.add_argument("--dense-dir", default = DEFAULT_CONFIG["dense_dir"])
+    parser.add_argument("--ann", choices = ["ivf", "hnsw"], default = DEFAULT_CONFIG["ann"])
+    parser.add_argument("--nprobe", type = int, default = DEFAULT_CONFIG["nprobe"])
+    parser.add_argument("--ef-search", type = int, default = DEFAULT_CONFIG["ef_search"])
+    parser.add_argument("--ann-exact-below", type = int, default = DEFAULT_CONFIG["ann_exact_below"])
+    args = parser.parse_args()
+
+    config = {
+        "db_path": args.db,
+        "store_dir": args.store,
+        "index_dir": args.index,
+        "cache_db_path": args.cache_db,
+        "cache_disk_size": args.cache_disk_size,
+        "threads_per_worker": args.threads_per_worker,
+        "retriever": args.retriever,
+        "dense_dir": args.dense_dir,
+        "ann": args.ann,
+        "nprobe": args.nprobe,
+        "ef_search": args.ef_search,
+        "ann_exact_below": args.ann_exact_below,
+    }
+    dispatcher = JobDispatcher(JobQueue(ConnectionPool(args.db, size = 2)), workers = args.workers, config = config).start()
+    print(f"Running {args.workers} recommendation workers ({args.threads_per_worker} thread(s) each, {args.retriever} retrieval)")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        dispatcher.stop()
+
+if __name__ == "__main__":
+    main()
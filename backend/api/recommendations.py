@@ -0,0 +1,75 @@
+import pytz
+from datetime import datetime
+from backend.api.database import get_article_sources, get_last_recommendation_time, get_new_interactions, save_recommendations
+
+# Minimum seconds to consider "interested"
+READ_TIME_INTERESTED = 120
+READ_TIME_NOT_INTERESTED = 30
+
+# Keeps the interactions that count as a signal, with their final type ("like", "read" or "dislike")
+def classify_interactions(interactions):
+    qualifying_interactions = []
+    for article_id, interaction_type, read_time_seconds in interactions:
+        if interaction_type == "like":
+            interaction_type_final = "like"
+        elif interaction_type == "read" and read_time_seconds >= READ_TIME_INTERESTED:
+            interaction_type_final = "read"
+        elif interaction_type == "dislike" or read_time_seconds < READ_TIME_NOT_INTERESTED:
+            interaction_type_final = "dislike"
+        else:
+            continue
+        qualifying_interactions.append((article_id, interaction_type_final))
+    return qualifying_interactions
+
+def get_qualifying_interactions(db_pool, user_id):
+    with db_pool.connection() as conn:
+        last_recommendation_time = get_last_recommendation_time(conn, user_id)
+        return classify_interactions(get_new_interactions(conn, user_id, last_recommendation_time))
+
+# Generates, stores & returns the recommendations for the user's interactions since the last request
+def generate_user_recommendations(db_pool, cache, store, tfidf_index, user_id, retriever = None):
+    qualifying_interactions = get_qualifying_interactions(db_pool, user_id)
+
+    # Score all seed articles at once, so overlapping date windows share the similarity work
+    recommended_by_seed = cache.recommend_batch(
+        [article_id for article_id, _ in qualifying_interactions], store, tfidf_index, retriever = retriever
+    )
+
+    with db_pool.connection() as conn:
+        sources = get_article_sources(conn, [article_id for article_id, _ in qualifying_interactions])
+
+    recommendations = []
+    for article_id, interaction_type_final in qualifying_interactions:
+        source_headline, source_outlet = sources.get(article_id, ("An article you engaged with", "An unknown source"))
+
+        recommended_articles = recommended_by_seed.get(article_id)
+
+        if recommended_articles is not None:
+            for _, rec in recommended_articles.iterrows():
+                recommendations.append({
+                    "id": int(rec["id"]),
+                    "interaction_type": interaction_type_final,
+                    "source_article_id": article_id,
+                    "source_article_headline": source_headline,
+                    "source_article_outlet": source_outlet,
+                    "date_publish": rec["date_publish"],
+                    "headline": rec["headline"],
+                    "outlet": rec["outlet"],
+                    "url": rec["url"],
+                    "political_leaning": rec["political_leaning"]
+                })
+
+    # Store new recommendations (skipping ones the user already has) & update last recommendation request time,
+    # in one short write transaction
+    local_time = datetime.now(pytz.timezone('Europe/Madrid')).strftime('%Y-%m-%d %H:%M:%S')
+    with db_pool.write_transaction() as conn:
+        save_recommendations(conn, user_id, recommendations, local_time)
+
+    return [r for r in recommendations if r["interaction_type"] in ("like", "read")]
+
+# Computes recommendations for the user's new interactions into the shared cache, without storing them,
+# so the next explicit request only has to read them back
+def warm_user_recommendations(db_pool, cache, store, tfidf_index, user_id, retriever = None):
+    qualifying_interactions = get_qualifying_interactions(db_pool, user_id)
+    cache.recommend_batch([article_id for article_id, _ in qualifying_interactions], store, tfidf_index, retriever = retriever)
+    return len(qualifying_interactions)
@@ -0,0 +1,189 @@
+import os
+import time
+import random
+import shutil
+import sqlite3
+import argparse
+import tempfile
+import threading
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+from backend.api.database import (
+    ConnectionPool, get_article_sources, get_last_recommendation_time, get_new_interactions, save_recommendations
+)
+
+SCHEMA = """
+    CREATE TABLE users (
+        id INTEGER PRIMARY KEY, username TEXT, email TEXT, password TEXT, political_leaning TEXT, role TEXT,
+        last_recommendation_timestamp TEXT
+    );
+    CREATE TABLE interactions (
+        id INTEGER, user_id INTEGER, interaction_type TEXT, read_time_seconds INTEGER, interaction_timestamp TEXT
+    );
+    CREATE TABLE news_articles (id INTEGER PRIMARY KEY, headline TEXT, outlet TEXT);
+    CREATE TABLE recommendations (
+        id INTEGER, user_id INTEGER, interaction_type TEXT, source_article_id INTEGER, source_article_headline TEXT,
+        date_publish TEXT, headline TEXT, outlet TEXT, url TEXT, political_leaning TEXT
+    );
+    CREATE INDEX idx_interactions_user_id ON interactions (user_id);
+"""
+
+# Local database with `n_users` users, each with `interactions_per_user` interactions over `n_articles` articles
+def create_database(path, n_users, interactions_per_user, n_articles, seed = 42):
+    rng = random.Random(seed)
+    conn = sqlite3.connect(path)
+    conn.executescript(SCHEMA)
+    conn.executemany("INSERT INTO news_articles VALUES (?, ?, ?)", [(i, f"Headline {i}", f"Outlet {i % 18}") for i in range(n_articles)])
+    conn.executemany("INSERT INTO users (id, username, role) VALUES (?, ?, 'user')", [(u, f"user{u}") for u in range(1, n_users + 1)])
+    conn.executemany("INSERT INTO interactions VALUES (?, ?, ?, ?, ?)", [
+        (rng.randrange(n_articles), u, rng.choice(["like", "read", "dislike"]), rng.randrange(0, 300), "2025-01-01 00:00:00")
+        for u in range(1, n_users + 1) for _ in range(interactions_per_user)
+    ])
+    conn.commit()
+    conn.close()
+
+# Stand-in for the recommender output, so the test only measures database traffic
+def fake_recommendations(article_id, n_articles, top_n = 5):
+    return [{
+        "id": (article_id * 7 + k) % n_articles, "date_publish": "2019-01-01 00:00:00", "headline": "Recommended",
+        "outlet": "Outlet", "url": "http://example.com", "political_leaning": "CENTER",
+    } for k in range(1, top_n + 1)]
+
+def build_recommendations(interactions, sources, n_articles):
+    recommendations = []
+    for article_id, interaction_type, _ in interactions:
+        headline, _ = sources.get(article_id, ("An article you engaged with", "An unknown source"))
+        for rec in fake_recommendations(article_id, n_articles):
+            recommendations.append({**rec, "interaction_type": interaction_type, "source_article_id": article_id, "source_article_headline": headline})
+    return recommendations
+
+# Database traffic of the original endpoint: a connection per request, a SELECT per interaction,
+# a SELECT + INSERT per recommendation, all inside the implicit write transaction
+def legacy_request(db_path, user_id, n_articles, stats):
+    conn = sqlite3.connect(db_path)
+    cursor = conn.cursor()
+    try:
+        cursor.execute("SELECT last_recommendation_timestamp FROM users WHERE id = ?", (user_id,))
+        cursor.fetchone()
+        cursor.execute("SELECT id, interaction_type, read_time_seconds FROM interactions WHERE user_id = ?", (user_id,))
+        interactions = cursor.fetchall()
+
+        sources = {}
+        for article_id, _, _ in interactions:
+            cursor.execute("SELECT headline, outlet FROM news_articles WHERE id = ?", (article_id,))
+            row = cursor.fetchone()
+            if row:
+                sources[article_id] = row
+
+        write_start = None
+        for rec in build_recommendations(interactions, sources, n_articles):
+            cursor.execute("SELECT 1 FROM recommendations WHERE user_id = ? AND id = ?", (user_id, rec["id"]))
+            if cursor.fetchone():
+                continue
+            if write_start is None:
+                write_start = time.perf_counter()
+            cursor.execute(
+                "INSERT INTO recommendations VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (rec["id"], user_id, rec["interaction_type"], rec["source_article_id"], rec["source_article_headline"],
+                 rec["date_publish"], rec["headline"], rec["outlet"], rec["url"], rec["political_leaning"]),
+            )
+        if write_start is None:
+            write_start = time.perf_counter()
+        cursor.execute("UPDATE users SET last_recommendation_timestamp = ? WHERE id = ?", ("2025-06-01 00:00:00", user_id))
+        conn.commit()
+        stats.record_lock(time.perf_counter() - write_start)
+    finally:
+        cursor.close()
+        conn.close()
+
+def pooled_request(pool, user_id, n_articles, stats):
+    with pool.connection() as conn:
+        since = get_last_recommendation_time(conn, user_id)
+        interactions = get_new_interactions(conn, user_id, since)
+        sources = get_article_sources(conn, [article_id for article_id, _, _ in interactions])
+
+    recommendations = build_recommendations(interactions, sources, n_articles)
+    with pool.write_transaction() as conn:
+        write_start = time.perf_counter()
+        save_recommendations(conn, user_id, recommendations, "2025-06-01 00:00:00")
+    stats.record_lock(time.perf_counter() - write_start)
+
+class Stats:
+    def __init__(self):
+        self.latencies, self.lock_hold, self.errors = [], [], 0
+        self._lock = threading.Lock()
+
+    def record_error(self):
+        with self._lock:
+            self.errors += 1
+
+    def record_lock(self, seconds):
+        with self._lock:
+            self.lock_hold.append(seconds)
+
+    def summary(self, wall_seconds):
+        latencies = np.array(self.latencies) * 1000
+        lock_hold = np.array(self.lock_hold) * 1000
+        return {
+            "requests": len(self.latencies),
+            "errors": self.errors,
+            "throughput_rps": len(self.latencies) / wall_seconds,
+            "latency_p50_ms": float(np.percentile(latencies, 50)),
+            "latency_p99_ms": float(np.percentile(latencies, 99)),
+            "write_lock_held_mean_ms": float(lock_hold.mean()) if len(lock_hold) else 0.0,
+            "write_lock_held_total_s": float(lock_hold.sum()) / 1000,
+        }
+
+def run_mode(mode, db_path, user_ids, n_articles, concurrency):
+    stats = Stats()
+    pool = ConnectionPool(db_path, size = concurrency) if mode == "pooled" else None
+
+    def request(user_id):
+        start = time.perf_counter()
+        try:
+            if pool is None:
+                legacy_request(db_path, user_id, n_articles, stats)
+            else:
+                pooled_request(pool, user_id, n_articles, stats)
+        except sqlite3.OperationalError:
+            stats.record_error()
+            return
+        stats.latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers = concurrency) as executor:
+        list(executor.map(request, user_ids))
+    wall_seconds = time.perf_counter() - start
+
+    if pool is not None:
+        pool.close()
+    return stats.summary(wall_seconds)
+
+def run(n_users = 2000, interactions_per_user = 10, n_articles = 50_000, concurrency = 16):
+    workdir = tempfile.mkdtemp(prefix = "db_load_test_")
+    try:
+        template = os.path.join(workdir, "template.db")
+        create_database(template, n_users, interactions_per_user, n_articles)
+        user_ids = list(range(1, n_users + 1))
+        random.Random(0).shuffle(user_ids)
+
+        results = {}
+        for mode in ("legacy", "pooled"):
+            db_path = os.path.join(workdir, f"{mode}.db")
+            shutil.copy(template, db_path)
+            results[mode] = run_mode(mode, db_path, user_ids, n_articles, concurrency)
+        return results
+    finally:
+        shutil.rmtree(workdir, ignore_errors = True)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description = "Load test the /recommendations database traffic: legacy N+1 access vs pooled batched access.")
+    parser.add_argument("--users", type = int, default = 2000)
+    parser.add_argument("--interactions-per-user", type = int, default = 10)
+    parser.add_argument("--articles", type = int, default = 50_000)
+    parser.add_argument("--concurrency", type = int, default = 16)
+    args = parser.parse_args()
+
+    results = run(args.users, args.interactions_per_user, args.articles, args.concurrency)
+    for mode, summary in results.items():
+        print(f"{mode:>7}: " + ", ".join(f"{name}={value:.2f}" if isinstance(value, float) else f"{name}={value}" for name, value in summary.items()))
@@ -0,0 +1,278 @@
+import sys
+import json
+import time
+import shutil
+import argparse
+import resource
+import tempfile
+import multiprocessing
+import numpy as np
+import pandas as pd
+from datetime import datetime
+from scipy.stats import entropy
+from concurrent.futures import ProcessPoolExecutor
+from threadpoolctl import threadpool_limits
+from backend.models.article_store import DEFAULT_STORE_DIR, convert_dataframe_to_store, load_article_store
+from backend.models.tfidf_index import DEFAULT_INDEX_DIR, build_tfidf_index, load_tfidf_index
+from backend.models.retrieval import DEFAULT_DENSE_DIR, load_retriever
+from backend.models.reranking import LEANINGS, QuotaPolicy, leaning_codes
+from backend.models.recommendation_function import recommend_articles_bias_controlled, recommend_articles_bias_controlled_batch, retrieve_candidates
+
+# Ideal political leaning distribution the KL divergence is measured against (as in recommender_system.ipynb)
+IDEAL_DISTRIBUTION = [0.33, 0.33, 0.33]
+
+# A run fails when it regresses past these limits against the baseline: latency & throughput as relative changes,
+# fairness metrics as absolute changes of their means
+DEFAULT_THRESHOLDS = {
+    "latency_p95": 0.25,
+    "throughput": 0.25,
+    "kl": 0.02,
+    "entropy": 0.02,
+    "outlet_concentration": 0.02,
+}
+
+# Synthetic corpus with the POLUSA layout: outlets with a fixed leaning, topics whose coverage leans towards one side
+def synthetic_polusa(n_articles, n_outlets = 18, n_topics = 300, vocabulary_size = 5000, n_days = 900, seed = 42):
+    rng = np.random.default_rng(seed)
+    vocabulary = np.array([f"term{i}" for i in range(vocabulary_size)])
+    topic_terms = [rng.choice(vocabulary_size, 60, replace = False) for _ in range(n_topics)]
+    topic_leaning = rng.integers(0, len(LEANINGS), n_topics)
+    outlet_leaning = np.arange(n_outlets) % len(LEANINGS)
+    outlets_by_leaning = [np.flatnonzero(outlet_leaning == leaning) for leaning in range(len(LEANINGS))]
+
+    topics = rng.integers(0, n_topics, n_articles)
+    leanings = np.where(rng.random(n_articles) < 0.7, topic_leaning[topics], rng.integers(0, len(LEANINGS), n_articles))
+    outlets = np.array([rng.choice(outlets_by_leaning[leaning]) for leaning in leanings])
+    dates = pd.Timestamp("2017-01-01") + pd.to_timedelta(rng.integers(0, n_days * 86400, n_articles), unit = "s")
+
+    return pd.DataFrame({
+        "id": rng.permutation(10 * n_articles)[:n_articles] + 1,
+        "date_publish": dates.strftime("%Y-%m-%d %H:%M:%S"),
+        "outlet": [f"Outlet {outlet}" for outlet in outlets],
+        "headline": [f"Headline {i}" for i in range(n_articles)],
+        "url": [f"https://example.com/{i}" for i in range(n_articles)],
+        "political_leaning": np.array(LEANINGS)[leanings],
+        "text_cleaned": [" ".join(vocabulary[np.r_[rng.choice(topic_terms[topic], 32), rng.integers(0, vocabulary_size, 8)]]) for topic in topics],
+    })
+
+# Seeds as in recommender_system.ipynb: one article per leaning from each of `n_splits` consecutive time ranges
+def sample_seeds(store, n_splits = 30, seed = 42):
+    rng = np.random.default_rng(seed)
+    leanings = np.array(store.categories("political_leaning"))[store.codes("political_leaning")]
+    seeds = {leaning: [] for leaning in LEANINGS}
+    for days in np.array_split(np.unique(store.days), n_splits):
+        in_range = (store.days >= days[0]) & (store.days <= days[-1])
+        for leaning in LEANINGS:
+            candidates = np.flatnonzero(in_range & (leanings == leaning))
+            if len(candidates):
+                seeds[leaning].append(int(store.ids[rng.choice(candidates)]))
+    return seeds
+
+def leaning_distribution(leanings):
+    counts = np.bincount(leanings, minlength = len(LEANINGS))
+    return counts / counts.sum()
+
+# KL divergence from the ideal distribution, Shannon entropy of the leanings & share of the most frequent outlet
+def fairness_metrics(leanings, outlets):
+    distribution = leaning_distribution(leanings)
+    return {
+        "kl": float(entropy(distribution, IDEAL_DISTRIBUTION)),
+        "entropy": float(entropy(distribution)),
+        "outlet_concentration": float(np.bincount(outlets).max() / len(outlets)),
+    }
+
+def summarize_fairness(metrics):
+    frame = pd.DataFrame(metrics)
+    names = ["kl", "entropy", "outlet_concentration"]
+    return {
+        "mean": frame[names].mean().to_dict(),
+        "by_leaning": frame.groupby("leaning")[names].mean().to_dict("index"),
+    }
+
+# Fairness metrics before re-ranking (the nearest neighbors, as `recommend_articles_unfiltered`) and after it,
+# for each primary weight
+def evaluate_fairness(store, tfidf_index, seeds, retriever, top_n = 5, primary_weights = (2, 3)):
+    leanings = leaning_codes(store.categories("political_leaning"))[store.codes("political_leaning")]
+    outlets = store.codes("outlet")
+    seed_leaning = {article_id: leaning for leaning, article_ids in seeds.items() for article_id in article_ids}
+
+    # Before: the nearest neighbors as retrieved. Seeds whose window is too small to search are left out of every stage.
+    article_ids, candidate_rows, _, _ = retrieve_candidates(list(seed_leaning), tfidf_index, top_n, retriever = retriever)
+    selections = {"before": [rows[:top_n] for rows in candidate_rows]}
+
+    # After: the recommender itself, re-ranking with each quota
+    for primary_weight in primary_weights:
+        recommendations = recommend_articles_bias_controlled_batch(
+            article_ids, store, tfidf_index, primary_weight = primary_weight, top_n = top_n,
+            policy = QuotaPolicy(primary_weight), retriever = retriever,
+        )
+        selections[f"after_w{primary_weight}"] = [store.rows(recommendations[article_id]["id"]) for article_id in article_ids]
+
+    return {
+        name: summarize_fairness([
+            {"leaning": seed_leaning[article_id], **fairness_metrics(leanings[rows], outlets[rows])}
+            for article_id, rows in zip(article_ids, selected)
+        ])
+        for name, selected in selections.items()
+    }
+
+# Peak resident memory of this process: `ru_maxrss` is in bytes on macOS and in KiB on Linux
+def peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 1024 ** 2 if sys.platform == "darwin" else peak / 1024
+
+# Per-process state of the benchmark workers, loaded once per process like the recommendation worker tier
+_worker = {}
+
+def init_worker(config):
+    _worker["threadpool_limits"] = threadpool_limits(limits = config["threads_per_worker"])
+    _worker["store"] = load_article_store(config["store_dir"])
+    _worker["tfidf_index"] = load_tfidf_index(config["index_dir"])
+    _worker["retriever"] = load_retriever(_worker["tfidf_index"], config["retriever"], config["dense_dir"])
+
+def recommend(article_id):
+    recommend_articles_bias_controlled(article_id, _worker["store"], _worker["tfidf_index"], retriever = _worker["retriever"])
+    return peak_rss_mb()
+
+# Runs in a fresh process: when the first recommendation was served, time spent loading the data & serving it,
+# then per-call latencies
+def profile_worker(config, article_ids, rounds = 5):
+    start = time.perf_counter()
+    init_worker(config)
+    recommend(article_ids[0])
+    first_served_at, load_seconds = time.time(), time.perf_counter() - start
+
+    latencies = []
+    for article_id in article_ids * rounds:
+        start = time.perf_counter()
+        recommend(article_id)
+        latencies.append(time.perf_counter() - start)
+    return first_served_at, load_seconds, latencies, peak_rss_mb()
+
+# Recommendations per second with `workers` processes serving single-seed calls, after each worker has loaded the data.
+# Batches of `rounds` passes over the seeds are served until at least `min_seconds` have passed.
+def measure_throughput(config, article_ids, workers, rounds = 5, min_seconds = 3.0):
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers = workers, mp_context = context, initializer = init_worker, initargs = (config,)) as executor:
+        list(executor.map(recommend, article_ids[:workers * 2]))
+
+        calls, peak = 0, 0.0
+        start = time.perf_counter()
+        while time.perf_counter() - start < min_seconds:
+            peak = max(peak, *executor.map(recommend, article_ids * rounds, chunksize = 4))
+            calls += len(article_ids) * rounds
+        wall_seconds = time.perf_counter() - start
+    return calls / wall_seconds, peak
+
+def run(config, workers = (1, 2, 4), top_n = 5, rounds = 5):
+    store = load_article_store(config["store_dir"])
+    tfidf_index = load_tfidf_index(config["index_dir"])
+    seeds = sample_seeds(store)
+    article_ids = [article_id for article_ids in seeds.values() for article_id in article_ids]
+
+    # Cold start: from starting a worker process (interpreter & imports included) to its first recommendation
+    started_at = time.time()
+    with ProcessPoolExecutor(max_workers = 1, mp_context = multiprocessing.get_context("spawn")) as executor:
+        first_served_at, load_seconds, latencies, peak_memory = executor.submit(profile_worker, config, article_ids, rounds).result()
+    # Percentiles of each pass over the seeds, then their median across passes, so that a burst of outside load
+    # during one pass does not decide the result
+    latencies = np.array(latencies).reshape(rounds, -1) * 1000
+
+    throughput = {}
+    for n_workers in workers:
+        throughput[str(n_workers)], worker_peak = measure_throughput(config, article_ids, n_workers, rounds)
+        peak_memory = max(peak_memory, worker_peak)
+
+    return {
+        "created_at": datetime.now().isoformat(timespec = "seconds"),
+        "config": {**config, "articles": len(store), "seeds": len(article_ids), "top_n": top_n, "rounds": rounds},
+        "cold_start_s": first_served_at - started_at,
+        "load_s": load_seconds,
+        "latency_ms": {f"p{q}": float(np.median(np.percentile(latencies, q, axis = 1))) for q in (50, 95, 99)},
+        "throughput_rps": throughput,
+        "peak_rss_mb": peak_memory,
+        "fairness": evaluate_fairness(store, tfidf_index, seeds, load_retriever(tfidf_index, config["retriever"], config["dense_dir"]), top_n),
+    }
+
+# Regressions of `result` against `baseline` past the thresholds, as human-readable messages
+def compare(result, baseline, thresholds = DEFAULT_THRESHOLDS):
+    failures = []
+
+    current, previous = result["latency_ms"]["p95"], baseline["latency_ms"]["p95"]
+    if current > previous * (1 + thresholds["latency_p95"]):
+        failures.append(f"p95 latency {current:.2f} ms vs {previous:.2f} ms (limit +{thresholds['latency_p95']:.0%})")
+
+    for workers, previous in baseline["throughput_rps"].items():
+        current = result["throughput_rps"].get(workers)
+        if current is not None and current < previous * (1 - thresholds["throughput"]):
+            failures.append(f"throughput with {workers} worker(s) {current:.1f} rps vs {previous:.1f} rps (limit -{thresholds['throughput']:.0%})")
+
+    for name, stage in result["fairness"].items():
+        if name == "before" or name not in baseline["fairness"]:
+            continue
+        current, previous = stage["mean"], baseline["fairness"][name]["mean"]
+        for metric, worse in (("kl", 1), ("entropy", -1), ("outlet_concentration", 1)):
+            if worse * (current[metric] - previous[metric]) > thresholds[metric]:
+                failures.append(f"{name} {metric} {current[metric]:.3f} vs {previous[metric]:.3f} (limit {thresholds[metric]:.3f})")
+
+    return failures
+
+def print_report(result):
+    print(f"{result['config']['articles']} articles, {result['config']['seeds']} seeds, {result['config']['retriever']} retrieval")
+    print(f"Cold start:   {result['cold_start_s']:.2f} s ({result['load_s']:.2f} s loading data & serving the first call)")
+    print("Latency:      " + ", ".join(f"{q}={value:.2f} ms" for q, value in result["latency_ms"].items()))
+    print("Throughput:   " + ", ".join(f"{workers} worker(s)={value:.1f} rps" for workers, value in result["throughput_rps"].items()))
+    print(f"Peak memory:  {result['peak_rss_mb']:.0f} MB (largest worker RSS)")
+    for name, stage in result["fairness"].items():
+        print(f"{name:<12}  " + ", ".join(f"{metric}={value:.3f}" for metric, value in stage["mean"].items()))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description = "Benchmark the recommender's performance and fairness, optionally against a baseline run.")
+    parser.add_argument("--store", default = DEFAULT_STORE_DIR)
+    parser.add_argument("--index", default = DEFAULT_INDEX_DIR)
+    parser.add_argument("--synthetic", type = int, metavar = "N", help = "Benchmark a synthetic corpus of N articles instead of --store/--index")
+    parser.add_argument("--retriever", choices = ["exact", "dense", "ann"], default = "exact")
+    parser.add_argument("--dense-dir", default = DEFAULT_DENSE_DIR)
+    parser.add_argument("--workers", type = int, nargs = "+", default = [1, 2, 4])
+    parser.add_argument("--threads-per-worker", type = int, default = 1)
+    parser.add_argument("--rounds", type = int, default = 5, help = "Times each seed is recommended for latency & throughput")
+    parser.add_argument("--output", help = "Save the results as JSON")
+    parser.add_argument("--baseline", help = "Results JSON of a previous run to compare against")
+    for name, limit in DEFAULT_THRESHOLDS.items():
+        parser.add_argument(f"--max-{name.replace('_', '-')}-regression", type = float, default = limit, dest = name)
+    args = parser.parse_args()
+
+    workdir = None
+    if args.synthetic:
+        workdir = tempfile.mkdtemp(prefix = "recommender_benchmark_")
+        args.store, args.index = f"{workdir}/article_store", f"{workdir}/tfidf_index"
+        store = convert_dataframe_to_store(synthetic_polusa(args.synthetic), args.store)
+        build_tfidf_index(store, args.index)
+
+    config = {
+        "store_dir": args.store,
+        "index_dir": args.index,
+        "retriever": args.retriever,
+        "dense_dir": args.dense_dir,
+        "threads_per_worker": args.threads_per_worker,
+    }
+    try:
+        result = run(config, args.workers, rounds = args.rounds)
+    finally:
+        if workdir:
+            shutil.rmtree(workdir, ignore_errors = True)
+
+    print_report(result)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(result, f, indent = 2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        failures = compare(result, baseline, {name: getattr(args, name) for name in DEFAULT_THRESHOLDS})
+        for failure in failures:
+            print(f"REGRESSION: {failure}")
+        if failures:
+            sys.exit(1)
+        print("No regressions against the baseline")
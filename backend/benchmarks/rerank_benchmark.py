@@ -0,0 +1,82 @@
+import time
+import argparse
+import numpy as np
+import pandas as pd
+from backend.models.reranking import LEANINGS, QuotaPolicy, rerank_candidates
+from backend.models.recommendation_function import enforce_political_diversity, fairness_re_ranking
+
+# Random candidate lists shaped like the recommender's (top_n * 3 - 1 neighbors, sorted by similarity)
+def synthetic_candidate_lists(n_lists, n_candidates, n_outlets = 18, seed = 42):
+    rng = np.random.default_rng(seed)
+    lists = []
+    for i in range(n_lists):
+        lists.append({
+            "id": np.arange(n_candidates, dtype = np.int64) + i * n_candidates,
+            "leaning": rng.integers(0, len(LEANINGS), n_candidates),
+            "outlet": rng.integers(0, n_outlets, n_candidates),
+            "score": np.sort(rng.random(n_candidates))[::-1],
+        })
+    return lists
+
+def rerank_reference(candidates, primary_weight, top_n):
+    recommendations = pd.DataFrame({
+        "id": candidates["id"],
+        "political_leaning": np.array(LEANINGS)[candidates["leaning"]],
+        "outlet": candidates["outlet"],
+    })
+    recommendations = enforce_political_diversity(recommendations, top_n = top_n, primary_weight = primary_weight)
+    recommendations = fairness_re_ranking(recommendations)
+    return recommendations.head(top_n)["id"].to_numpy()
+
+def rerank_arrays(lists, primary_weight, top_n):
+    return rerank_candidates(
+        [c["id"] for c in lists],
+        [c["leaning"] for c in lists],
+        [c["outlet"] for c in lists],
+        [c["score"] for c in lists],
+        policy = QuotaPolicy(primary_weight),
+        top_n = top_n,
+    )
+
+def run(n_lists = 1000, top_n = 5, primary_weight = 2):
+    lists = synthetic_candidate_lists(n_lists, top_n * 3 - 1)
+
+    # Step 1: Check identical output over a range of quota settings
+    for weight in range(0, top_n + 2):
+        for n in range(1, top_n + 3):
+            check_lists = synthetic_candidate_lists(50, n * 3 - 1, seed = weight * 100 + n)
+            expected = [rerank_reference(c, weight, n) for c in check_lists]
+            actual = rerank_arrays(check_lists, weight, n)
+            mismatches = sum(not np.array_equal(e, a) for e, a in zip(expected, actual))
+            if mismatches:
+                raise AssertionError(f"{mismatches} mismatching lists for primary_weight={weight}, top_n={n}")
+
+    # Step 2: Time both implementations on the same batch
+    start = time.perf_counter()
+    for candidates in lists:
+        rerank_reference(candidates, primary_weight, top_n)
+    reference_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    rerank_arrays(lists, primary_weight, top_n)
+    array_seconds = time.perf_counter() - start
+
+    return {
+        "lists": n_lists,
+        "reference_ms_per_list": 1000 * reference_seconds / n_lists,
+        "array_ms_per_list": 1000 * array_seconds / n_lists,
+        "speedup": reference_seconds / array_seconds,
+    }
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description = "Compare the DataFrame and array-based re-ranking stages.")
+    parser.add_argument("--lists", type = int, default = 1000)
+    parser.add_argument("--top-n", type = int, default = 5)
+    parser.add_argument("--primary-weight", type = int, default = 2)
+    args = parser.parse_args()
+
+    result = run(args.lists, args.top_n, args.primary_weight)
+    print("Identical output on all checked settings")
+    print(f"DataFrame re-ranking: {result['reference_ms_per_list']:.3f} ms/list")
+    print(f"Array re-ranking:     {result['array_ms_per_list']:.3f} ms/list (batch of {result['lists']})")
+    print(f"Speedup:              {result['speedup']:.1f}x")
@@ -0,0 +1,91 @@
+import os
+import time
+import argparse
+import numpy as np
+from backend.models.tfidf_index import DEFAULT_INDEX_DIR, load_tfidf_index
+from backend.models.recommendation_function import select_window
+from backend.models.retrieval import DEFAULT_DENSE_DIR, DenseRetriever, ExactSparseRetriever, load_retriever
+
+# Random seeds with their recommender windows (seeds whose window is too small to need a search are skipped)
+def sample_queries(tfidf_index, n_queries, top_n = 5, base_days_window = 5, max_days_window = 10, seed = 42):
+    rng = np.random.default_rng(seed)
+    positions, windows = [], []
+    for position in rng.choice(len(tfidf_index), min(n_queries * 2, len(tfidf_index)), replace = False):
+        lo, hi = select_window(tfidf_index, int(position), top_n, base_days_window, max_days_window)
+        if hi - lo >= top_n:
+            positions.append(int(position))
+            windows.append((lo, hi))
+        if len(positions) == n_queries:
+            break
+    return positions, windows
+
+# Per-query latency (one seed per call, as for a single interaction) & the neighbors found, seed excluded
+def measure(retriever, positions, windows, n_neighbors):
+    latencies, neighbors = [], []
+    for position, window in zip(positions, windows):
+        start = time.perf_counter()
+        (nearest, _), = retriever.search([position], [window], n_neighbors)
+        latencies.append(time.perf_counter() - start)
+        neighbors.append(nearest[1:])
+    return np.array(latencies) * 1000, neighbors
+
+def recall(neighbors, exact_neighbors):
+    return float(np.mean([
+        len(np.intersect1d(found, expected)) / len(expected) if len(expected) else 1.0
+        for found, expected in zip(neighbors, exact_neighbors)
+    ]))
+
+# Recall@k of each backend against the exact sparse search (and, for ANN indexes, against exact search over the same
+# dense vectors, which isolates the index's own error), with its query latency, over the available builds.
+# ANN settings run with neither exact fallback (no size threshold, short results kept as they are), so they measure
+# the index itself; `short_results` counts the queries that came back with fewer neighbors than asked for.
+def run(index_dir = DEFAULT_INDEX_DIR, dense_dir = DEFAULT_DENSE_DIR, n_queries = 500, top_n = 5, days_window = 5, nprobes = (1, 4, 16, 64), ef_searches = (16, 64, 256)):
+    tfidf_index = load_tfidf_index(index_dir)
+    positions, windows = sample_queries(tfidf_index, n_queries, top_n, days_window, max(days_window, 10))
+    n_neighbors = top_n * 3
+
+    retrievers = [ExactSparseRetriever(tfidf_index)]
+    if os.path.exists(os.path.join(dense_dir, "vectors.npy")):
+        retrievers.append(load_retriever(tfidf_index, "dense", dense_dir))
+    if os.path.exists(os.path.join(dense_dir, "ivf.faiss")):
+        retrievers += [load_retriever(tfidf_index, "ann", dense_dir, ann = "ivf", nprobe = nprobe, fallback = False) for nprobe in nprobes]
+    if os.path.exists(os.path.join(dense_dir, "hnsw.faiss")):
+        retrievers += [load_retriever(tfidf_index, "ann", dense_dir, ann = "hnsw", ef_search = ef_search, fallback = False) for ef_search in ef_searches]
+
+    results, exact_neighbors, dense_neighbors = [], None, None
+    for retriever in retrievers:
+        latencies, neighbors = measure(retriever, positions, windows, n_neighbors)
+        if exact_neighbors is None:
+            exact_neighbors = neighbors
+        if isinstance(retriever, DenseRetriever):
+            dense_neighbors = neighbors
+        results.append({
+            "retriever": repr(retriever),
+            f"recall@{n_neighbors - 1}": recall(neighbors, exact_neighbors),
+            f"dense_recall@{n_neighbors - 1}": recall(neighbors, dense_neighbors) if dense_neighbors is not None else None,
+            "short_results": sum(len(found) < min(n_neighbors, hi - lo) - 1 for found, (lo, hi) in zip(neighbors, windows)),
+            "latency_p50_ms": float(np.percentile(latencies, 50)),
+            "latency_p95_ms": float(np.percentile(latencies, 95)),
+        })
+    return {
+        "queries": len(positions),
+        "mean_window_rows": float(np.mean([hi - lo for lo, hi in windows])),
+        "results": results,
+    }
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description = "Recall and latency of the similarity-search backends against exact sparse search.")
+    parser.add_argument("--index", default = DEFAULT_INDEX_DIR)
+    parser.add_argument("--dense-dir", default = DEFAULT_DENSE_DIR)
+    parser.add_argument("--queries", type = int, default = 500)
+    parser.add_argument("--top-n", type = int, default = 5)
+    parser.add_argument("--days-window", type = int, default = 5, help = "Days on each side of the seed (the recommender uses 5)")
+    args = parser.parse_args()
+
+    result = run(args.index, args.dense_dir, args.queries, args.top_n, args.days_window)
+    print(f"{result['queries']} queries, {result['mean_window_rows']:.0f} window rows on average")
+    for row in result["results"]:
+        print(f"{row['retriever']:<88} " + ", ".join(
+            f"{name}={value:.3f}" if isinstance(value, float) else f"{name}={value}"
+            for name, value in row.items() if name != "retriever" and value is not None
+        ))
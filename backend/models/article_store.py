@@ -0,0 +1,187 @@
+import os
+import json
+import shutil
+import argparse
+import numpy as np
+import pandas as pd
+from datetime import datetime
+
+DEFAULT_STORE_DIR = "backend/data/article_store"
+
+# Free-text columns, stored as a UTF-8 blob plus row offsets and decoded lazily
+TEXT_COLUMNS = ["date_publish", "headline", "url", "text_cleaned"]
+
+# Low-cardinality columns, stored as integer codes plus their category labels
+CATEGORY_COLUMNS = ["outlet", "political_leaning"]
+
+# Lazily decoded, memory-mapped string column
+class TextColumn:
+    def __init__(self, blob, offsets):
+        self.blob = blob
+        self.offsets = offsets
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, row):
+        return bytes(self.blob[self.offsets[row]:self.offsets[row + 1]]).decode("utf-8")
+
+    def __iter__(self):
+        for row in range(len(self)):
+            yield self[row]
+
+    def take(self, rows):
+        return [self[row] for row in rows]
+
+# Read-only article table backed by memory-mapped column files, date-sorted when built (articles added by
+# `backend.models.ingestion` are appended after the existing rows).
+# Forked workers share the mapped pages instead of holding private copies of the dataset.
+class ArticleStore:
+    def __init__(self, store_dir, meta):
+        self.store_dir = store_dir
+        self.meta = meta
+        self.ids = self._load("id.npy")
+        self.days = self._load("day.npy")
+        self.id_index = pd.Index(self.ids)  # id -> row hash index
+        self._columns = {}
+
+    def __len__(self):
+        return self.meta["n_rows"]
+
+    @property
+    def version(self):
+        return self.meta["version"]
+
+    def _load(self, name):
+        return np.load(os.path.join(self.store_dir, name), mmap_mode = "r")
+
+    # Row of an article id, or None if it is not in the store
+    def row(self, article_id):
+        try:
+            return self.id_index.get_loc(article_id)
+        except KeyError:
+            return None
+
+    # Rows of several article ids, -1 where an id is not in the store
+    def rows(self, article_ids):
+        return self.id_index.get_indexer(article_ids)
+
+    def column(self, name):
+        if name not in self._columns:
+            if name in TEXT_COLUMNS:
+                self._columns[name] = TextColumn(self._load(f"{name}.bytes.npy"), self._load(f"{name}.offsets.npy"))
+            elif name in CATEGORY_COLUMNS:
+                self._columns[name] = self._load(f"{name}.codes.npy")
+            else:
+                raise KeyError(f"Unknown article store column: {name}")
+        return self._columns[name]
+
+    def codes(self, name):
+        return self.column(name)
+
+    def categories(self, name):
+        return self.meta["categories"][name]
+
+    # Materializes the given rows & columns as a DataFrame
+    def frame(self, rows, columns):
+        rows = np.asarray(rows, dtype = np.int64)
+        data = {}
+        for name in columns:
+            if name == "id":
+                data[name] = self.ids[rows]
+            elif name in CATEGORY_COLUMNS:
+                data[name] = np.asarray(self.categories(name), dtype = object)[self.codes(name)[rows]]
+            else:
+                data[name] = self.column(name).take(rows)
+        return pd.DataFrame(data, columns = columns)
+
+def load_article_store(store_dir = DEFAULT_STORE_DIR):
+    with open(os.path.join(store_dir, "meta.json")) as f:
+        meta = json.load(f)
+    return ArticleStore(store_dir, meta)
+
+# Finishes a swap interrupted by a crash: if `<dir>` is missing, the complete `<dir>.new` (or else `<dir>.old`)
+# is moved back into place, so the store or index is never rebuilt from scratch next to a complete copy
+def recover_directory(target_dir):
+    target_dir = os.path.normpath(target_dir)
+    if not os.path.exists(target_dir):
+        for leftover_dir in (target_dir + ".new", target_dir + ".old"):
+            if os.path.exists(os.path.join(leftover_dir, "meta.json")):
+                os.replace(leftover_dir, target_dir)
+                break
+    if os.path.exists(target_dir):
+        shutil.rmtree(target_dir + ".old", ignore_errors = True)
+
+# Stores & indexes are built into an empty `<dir>.new` and swapped in by `replace_directory`, never written in place:
+# running workers keep the files they have memory-mapped (truncating them would crash the workers) until they reload.
+# `meta.json` is written last, so a directory holding one is complete.
+def new_directory(target_dir):
+    target_dir = os.path.normpath(target_dir)
+    recover_directory(target_dir)
+    new_dir = target_dir + ".new"
+    shutil.rmtree(new_dir, ignore_errors = True)
+    os.makedirs(new_dir)
+    return new_dir
+
+def replace_directory(new_dir, target_dir):
+    target_dir = os.path.normpath(target_dir)
+    old_dir = target_dir + ".old"
+    if os.path.exists(target_dir):
+        shutil.rmtree(old_dir, ignore_errors = True)
+        os.replace(target_dir, old_dir)
+    os.replace(new_dir, target_dir)
+    shutil.rmtree(old_dir, ignore_errors = True)
+
+def write_text_column(store_dir, name, values):
+    encoded = [value.encode("utf-8") for value in values]
+    offsets = np.zeros(len(encoded) + 1, dtype = np.int64)
+    np.cumsum([len(value) for value in encoded], out = offsets[1:])
+    np.save(os.path.join(store_dir, f"{name}.bytes.npy"), np.frombuffer(b"".join(encoded), dtype = np.uint8))
+    np.save(os.path.join(store_dir, f"{name}.offsets.npy"), offsets)
+
+def convert_dataframe_to_store(df, store_dir = DEFAULT_STORE_DIR):
+    # Step 1: Pre-parse publication days & sort rows by day (stable, so ties keep dataset order)
+    days = pd.to_datetime(df["date_publish"]).to_numpy().astype("datetime64[D]").astype(np.int64)
+    order = np.argsort(days, kind = "stable")
+    df = df.iloc[order].reset_index(drop = True)
+
+    # Step 2: Write id & day columns (into a new directory, swapped in once complete)
+    new_dir = new_directory(store_dir)
+    np.save(os.path.join(new_dir, "id.npy"), df["id"].to_numpy(dtype = np.int64))
+    np.save(os.path.join(new_dir, "day.npy"), days[order])
+
+    # Step 3: Write text columns as blobs + offsets and low-cardinality columns as codes
+    for name in TEXT_COLUMNS:
+        write_text_column(new_dir, name, df[name].fillna("").astype(str))
+
+    categories = {}
+    for name in CATEGORY_COLUMNS:
+        codes, labels = pd.factorize(df[name].fillna("").astype(str), sort = True)
+        np.save(os.path.join(new_dir, f"{name}.codes.npy"), codes.astype(np.int32))
+        categories[name] = labels.tolist()
+
+    built_at = datetime.now()
+    meta = {
+        "n_rows": len(df),
+        "categories": categories,
+        "built_at": built_at.isoformat(timespec = "seconds"),
+        "version": built_at.strftime("%Y%m%d%H%M%S%f"),
+    }
+    with open(os.path.join(new_dir, "meta.json"), "w") as f:
+        json.dump(meta, f)
+
+    replace_directory(new_dir, store_dir)
+    return load_article_store(store_dir)
+
+def convert_csv_to_store(csv_path, store_dir = DEFAULT_STORE_DIR):
+    columns = ["id"] + TEXT_COLUMNS + CATEGORY_COLUMNS
+    return convert_dataframe_to_store(pd.read_csv(csv_path, header = 0, usecols = columns), store_dir)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description = "Convert the POLUSA CSV into the memory-mapped article store.")
+    parser.add_argument("--input", default = "backend/data/polusa_balanced.csv")
+    parser.add_argument("--output", default = DEFAULT_STORE_DIR)
+    args = parser.parse_args()
+
+    store = convert_csv_to_store(args.input, args.output)
+    print(f"Stored {len(store)} articles into {args.output}")
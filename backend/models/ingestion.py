@@ -0,0 +1,412 @@
+import os
+import re
+import glob
+import json
+import time
+import shutil
+import joblib
+import argparse
+import multiprocessing
+import numpy as np
+import pandas as pd
+from datetime import datetime
+from scipy.sparse import vstack
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from backend.models.article_store import (
+    CATEGORY_COLUMNS, DEFAULT_STORE_DIR, TEXT_COLUMNS, convert_dataframe_to_store, load_article_store, new_directory,
+    recover_directory, replace_directory,
+)
+from backend.models.tfidf_index import DEFAULT_INDEX_DIR, build_tfidf_index, load_tfidf_index
+
+DEFAULT_CHECKPOINT_DIR = "backend/data/ingestion"
+
+# Columns read from the raw POLUSA CSVs (lead & authors are dropped, as in recommender_system.ipynb)
+RAW_COLUMNS = ["id", "date_publish", "outlet", "headline", "body", "url", "political_leaning"]
+
+STORE_COLUMNS = ["id"] + TEXT_COLUMNS + CATEGORY_COLUMNS
+
+NLTK_RESOURCES = ["corpora/stopwords", "corpora/wordnet", "tokenizers/punkt", "tokenizers/punkt_tab"]
+
+# Rows of the .npy files copied per step when appending, to keep memory bounded on large stores
+COPY_ROWS = 1 << 24
+
+def check_nltk_resources():
+    import nltk
+
+    missing = []
+    for resource in NLTK_RESOURCES:
+        try:
+            nltk.data.find(resource)
+        except LookupError:
+            missing.append(resource.split("/")[-1])
+    if missing:
+        raise LookupError(f"Missing NLTK data, download it with `python -m nltk.downloader {' '.join(missing)}`")
+
+# Per-process state of the ingestion workers: NLTK models are loaded once per process
+_worker = {}
+
+def init_worker():
+    from nltk.corpus import stopwords
+    from nltk.stem import WordNetLemmatizer
+
+    _worker["lemmatizer"] = WordNetLemmatizer()
+    _worker["stop_words"] = set(stopwords.words("english"))
+
+# sumy TextRank summary of an article body (recommender_system.ipynb, 1.2 Body Summarizing)
+def summarize_text(text, num_sentences = 3):
+    from sumy.parsers.plaintext import PlaintextParser
+    from sumy.nlp.tokenizers import Tokenizer
+    from sumy.summarizers.text_rank import TextRankSummarizer
+
+    parser = PlaintextParser.from_string(text, Tokenizer("english"))
+    summarizer = TextRankSummarizer()
+    summary = summarizer(parser.document, num_sentences)
+    return ' '.join([str(sentence) for sentence in summary])
+
+# NLTK cleaning of headline + summary into lemmatized tokens (recommender_system.ipynb, 1.3 Text Cleaning)
+def clean_text(text):
+    from nltk.tokenize import word_tokenize
+
+    # Remove extra whitespaces
+    text = re.sub(r'\s+', ' ', text, flags=re.I)
+
+    # Remove special characters
+    text = re.sub(r'\W', ' ', str(text))
+
+    # Remove single characters
+    text = re.sub(r'\s+[a-zA-Z]\s+', ' ', text)
+
+    # Remove not alphabetical characters
+    text = re.sub(r'[^a-zA-Z\s]', ' ', text)
+
+    # Convert to lowercase
+    text = text.lower()
+
+    # Tokenization, lemmatization and stop words removal
+    tokens = word_tokenize(text)
+    return [_worker["lemmatizer"].lemmatize(word) for word in tokens if word not in _worker["stop_words"] and len(word) > 3]
+
+# Runs in a worker process: summarizes & cleans a chunk of raw articles into store rows, with per-stage seconds
+def process_chunk(chunk):
+    start = time.perf_counter()
+    summaries = [summarize_text(body) for body in chunk["body"]]
+    summarize_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    texts = chunk["headline"] + " " + pd.Series(summaries, index = chunk.index)
+    text_cleaned = [" ".join(clean_text(text)) for text in texts]
+    clean_seconds = time.perf_counter() - start
+
+    rows = chunk.drop(columns = ["body"]).assign(text_cleaned = text_cleaned)
+    return rows[STORE_COLUMNS], summarize_seconds, clean_seconds
+
+# Streams the raw CSVs in chunks, keeping the articles the recommender can serve
+def read_chunks(input_paths, chunk_size):
+    for path in input_paths:
+        for chunk in pd.read_csv(path, header = 0, chunksize = chunk_size, usecols = lambda column: column in RAW_COLUMNS):
+            chunk = chunk.dropna(subset = ["id", "headline"])
+            chunk = chunk[chunk["political_leaning"] != "UNDEFINED"]
+            yield chunk.assign(id = chunk["id"].astype(np.int64), body = chunk["body"].fillna("").astype(str))
+
+# Processed chunks waiting to be appended to the store & index, one CSV part per chunk. Parts are written
+# atomically, so after a crash every part on disk is complete and its articles are not processed again.
+class IngestionCheckpoint:
+    def __init__(self, checkpoint_dir = DEFAULT_CHECKPOINT_DIR):
+        self.parts_dir = os.path.join(checkpoint_dir, "pending")
+        os.makedirs(self.parts_dir, exist_ok = True)
+        self._next_part = len(self.parts())
+
+    def parts(self):
+        return sorted(glob.glob(os.path.join(self.parts_dir, "part-*.csv")))
+
+    def processed_ids(self):
+        return {int(article_id) for part in self.parts() for article_id in pd.read_csv(part, usecols = ["id"])["id"]}
+
+    def write(self, rows):
+        path = os.path.join(self.parts_dir, f"part-{self._next_part:06d}-{os.getpid()}.csv")
+        self._next_part += 1
+        rows.to_csv(path + ".tmp", index = False)
+        os.replace(path + ".tmp", path)
+
+    def load(self, parts):
+        return pd.concat([pd.read_csv(part, keep_default_na = False) for part in parts], ignore_index = True)
+
+    def remove(self, parts):
+        for part in parts:
+            os.remove(part)
+
+# Writes old + new values as one .npy file, copying the memory-mapped old values in bounded slices
+def write_concatenated(path, old, new):
+    new = np.asarray(new, dtype = old.dtype)
+    output = np.lib.format.open_memmap(path, mode = "w+", dtype = old.dtype, shape = (len(old) + len(new),))
+    for start in range(0, len(old), COPY_ROWS):
+        end = min(start + COPY_ROWS, len(old))
+        output[start:end] = old[start:end]
+    output[len(old):] = new
+    output.flush()
+    del output
+
+# Appends articles to the end of the store (existing rows keep their numbers) under a new store version. Every column
+# is copied into a new directory that is swapped in, so each append writes the whole store again.
+def append_to_store(store, rows):
+    new_dir = new_directory(store.store_dir)
+
+    days = pd.to_datetime(rows["date_publish"]).to_numpy().astype("datetime64[D]").astype(np.int64)
+    write_concatenated(os.path.join(new_dir, "id.npy"), store.ids, rows["id"].to_numpy(dtype = np.int64))
+    write_concatenated(os.path.join(new_dir, "day.npy"), store.days, days)
+
+    for name in TEXT_COLUMNS:
+        column = store.column(name)
+        encoded = [value.encode("utf-8") for value in rows[name].fillna("").astype(str)]
+        offsets = np.cumsum([len(value) for value in encoded], dtype = np.int64) + column.offsets[-1]
+        write_concatenated(os.path.join(new_dir, f"{name}.bytes.npy"), column.blob, np.frombuffer(b"".join(encoded), dtype = np.uint8))
+        write_concatenated(os.path.join(new_dir, f"{name}.offsets.npy"), column.offsets, offsets)
+
+    # New labels are added after the existing ones, so stored codes stay valid
+    categories = {}
+    for name in CATEGORY_COLUMNS:
+        labels = list(store.categories(name))
+        values = rows[name].fillna("").astype(str)
+        known = set(labels)
+        labels += [label for label in dict.fromkeys(values) if label not in known]
+        codes = pd.Index(labels).get_indexer(values)
+        write_concatenated(os.path.join(new_dir, f"{name}.codes.npy"), store.codes(name), codes.astype(np.int32))
+        categories[name] = labels
+
+    built_at = datetime.now()
+    meta = {
+        **store.meta,
+        "n_rows": len(store) + len(rows),
+        "categories": categories,
+        "appended_at": built_at.isoformat(timespec = "seconds"),
+        "version": built_at.strftime("%Y%m%d%H%M%S%f"),
+    }
+    with open(os.path.join(new_dir, "meta.json"), "w") as f:
+        json.dump(meta, f)
+
+    replace_directory(new_dir, store.store_dir)
+    return load_article_store(store.store_dir)
+
+# Whether the index rows still point at the articles they were indexed from, i.e. the store only grew since. False
+# once the store was rebuilt (e.g. with `convert_csv_to_store`) under a stale index.
+def index_rows_match(tfidf_index, store):
+    rows = tfidf_index.rows
+    if len(rows) and rows.max() >= len(store):
+        return False
+    return bool(np.array_equal(np.asarray(store.ids)[rows], tfidf_index.ids))
+
+# Adds the store rows missing from the index, vectorized with the saved vectorizer (no refit: vocabulary & IDF
+# stay those of the last full build) and merged into date order. Only the new articles are vectorized, but the merged
+# CSR buffers are written to a new directory in full. The index is marked as built from `store`, so it must only be
+# used when `index_rows_match`.
+def append_to_index(tfidf_index, index_dir, store):
+    new_rows = np.flatnonzero(~np.isin(np.asarray(store.ids), tfidf_index.ids))
+    new_rows = new_rows[np.argsort(np.asarray(store.days)[new_rows], kind = "stable")]
+
+    vectorizer = joblib.load(os.path.join(index_dir, "vectorizer.joblib"))
+    texts = store.column("text_cleaned")
+    new_matrix = vectorizer.transform(texts[row] for row in new_rows).astype(np.float32).tocsr()
+    new_matrix.sort_indices()
+
+    # Step 1: Merged date order (stable, so existing rows stay ahead of new rows published the same day)
+    days = np.r_[tfidf_index.days, np.asarray(store.days)[new_rows]]
+    order = np.argsort(days, kind = "stable")
+    lengths = np.r_[np.diff(tfidf_index.matrix.indptr), np.diff(new_matrix.indptr)][order]
+    indptr = np.zeros(len(order) + 1, dtype = np.int64)
+    np.cumsum(lengths, out = indptr[1:])
+
+    new_dir = new_directory(index_dir)
+
+    # Step 2: Write the merged CSR buffers in bounded runs of rows
+    data = np.lib.format.open_memmap(os.path.join(new_dir, "data.npy"), mode = "w+", dtype = np.float32, shape = (int(indptr[-1]),))
+    indices = np.lib.format.open_memmap(os.path.join(new_dir, "indices.npy"), mode = "w+", dtype = tfidf_index.matrix.indices.dtype, shape = (int(indptr[-1]),))
+    n_old = len(tfidf_index)
+    step = max(1, COPY_ROWS // max(1, int(lengths.mean()) if len(lengths) else 1))
+    for start in range(0, len(order), step):
+        sources = order[start:start + step]
+        is_old = sources < n_old
+        if is_old.all():
+            block = tfidf_index.matrix[sources]
+        else:
+            block = vstack([tfidf_index.matrix[sources[is_old]], new_matrix[sources[~is_old] - n_old]], format = "csr")
+            block = block[np.argsort(np.r_[np.flatnonzero(is_old), np.flatnonzero(~is_old)], kind = "stable")]
+        data[indptr[start]:indptr[start + len(sources)]] = block.data
+        indices[indptr[start]:indptr[start + len(sources)]] = block.indices
+    data.flush()
+    indices.flush()
+    del data, indices
+
+    np.save(os.path.join(new_dir, "indptr.npy"), indptr)
+    np.save(os.path.join(new_dir, "days.npy"), days[order])
+    np.save(os.path.join(new_dir, "ids.npy"), np.r_[tfidf_index.ids, np.asarray(store.ids)[new_rows]][order])
+    np.save(os.path.join(new_dir, "rows.npy"), np.r_[tfidf_index.rows, new_rows].astype(np.int64)[order])
+    shutil.copy(os.path.join(index_dir, "vectorizer.joblib"), os.path.join(new_dir, "vectorizer.joblib"))
+
+    meta = {
+        **tfidf_index.meta,
+        "n_rows": len(order),
+        "fitted_rows": tfidf_index.meta.get("fitted_rows", tfidf_index.meta["n_rows"]),
+        "store_version": store.version,
+        "built_at": datetime.now().isoformat(timespec = "seconds"),
+    }
+    with open(os.path.join(new_dir, "meta.json"), "w") as f:
+        json.dump(meta, f)
+
+    replace_directory(new_dir, index_dir)
+    return load_tfidf_index(index_dir)
+
+# Documents & seconds per stage; worker stages add up the seconds spent in every worker
+class StageStats:
+    STAGES = ["read", "summarize", "clean", "checkpoint", "store", "index"]
+
+    def __init__(self):
+        self.docs = dict.fromkeys(self.STAGES, 0)
+        self.seconds = dict.fromkeys(self.STAGES, 0.0)
+        self.skipped = 0
+        self.started = time.perf_counter()
+
+    def record(self, stage, docs, seconds):
+        self.docs[stage] += docs
+        self.seconds[stage] += seconds
+
+    def report(self):
+        return {
+            "stages": {
+                stage: {"docs": self.docs[stage], "seconds": self.seconds[stage], "docs_per_second": self.docs[stage] / self.seconds[stage] if self.seconds[stage] else None}
+                for stage in self.STAGES
+            },
+            "skipped": self.skipped,
+            "wall_seconds": time.perf_counter() - self.started,
+        }
+
+# Streaming ingestion of raw POLUSA CSVs: new articles are summarized & cleaned on a process pool (at most
+# 2 chunks per worker in flight), checkpointed as they finish, and appended to the article store & TF-IDF index
+# every `commit_rows` articles. Each commit rewrites the store & index in full (I/O proportional to the whole corpus),
+# so large backfills should use a large `commit_rows`. Articles already in the store or in a checkpoint part are
+# skipped, so an interrupted run resumes where it stopped.
+class Ingestion:
+    def __init__(self, store_dir = DEFAULT_STORE_DIR, index_dir = DEFAULT_INDEX_DIR, checkpoint_dir = DEFAULT_CHECKPOINT_DIR, workers = 2, chunk_size = 500, commit_rows = 50_000, max_features = 50_000):
+        self.store_dir = store_dir
+        self.index_dir = index_dir
+        self.checkpoint = IngestionCheckpoint(checkpoint_dir)
+        self.workers = workers
+        self.chunk_size = chunk_size
+        self.commit_rows = commit_rows
+        self.max_features = max_features
+        self.stats = StageStats()
+
+        # A crash in the middle of a swap leaves `<dir>` missing next to a complete `<dir>.new` or `<dir>.old`: put it
+        # back first, so that a store is never created from the pending articles alone
+        recover_directory(store_dir)
+        recover_directory(index_dir)
+        self.store = load_article_store(store_dir) if os.path.exists(os.path.join(store_dir, "meta.json")) else None
+        self.tfidf_index = load_tfidf_index(index_dir) if os.path.exists(os.path.join(index_dir, "meta.json")) else None
+        self._pending_rows = 0
+
+    # Articles already in the store or in a checkpoint part
+    def _is_known(self, article_ids, processed_ids):
+        known = np.isin(article_ids, list(processed_ids))
+        if self.store is not None:
+            known |= self.store.rows(article_ids) >= 0
+        return known
+
+    def run(self, input_paths):
+        check_nltk_resources()
+
+        # A previous run may have stopped between the store & index updates, or before committing its parts
+        self.commit()
+
+        processed_ids = self.checkpoint.processed_ids()
+        context = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(max_workers = self.workers, mp_context = context, initializer = init_worker) as executor:
+            in_flight = set()
+            chunks = read_chunks(input_paths, self.chunk_size)
+            while True:
+                start = time.perf_counter()
+                chunk = next(chunks, None)
+                if chunk is None:
+                    break
+                known = self._is_known(chunk["id"].to_numpy(), processed_ids)
+                chunk = chunk[~known].drop_duplicates(subset = ["id"])
+                processed_ids.update(chunk["id"].tolist())
+                self.stats.skipped += int(known.sum())
+                self.stats.record("read", len(chunk), time.perf_counter() - start)
+                if chunk.empty:
+                    continue
+
+                # Bounded memory: wait for a chunk to finish before reading more than 2 per worker ahead
+                if len(in_flight) >= self.workers * 2:
+                    done, in_flight = wait(in_flight, return_when = FIRST_COMPLETED)
+                    self._finish(done)
+                in_flight.add(executor.submit(process_chunk, chunk))
+
+            self._finish(in_flight)
+        self.commit()
+        return self.stats.report()
+
+    def _finish(self, futures):
+        for future in futures:
+            rows, summarize_seconds, clean_seconds = future.result()
+            self.stats.record("summarize", len(rows), summarize_seconds)
+            self.stats.record("clean", len(rows), clean_seconds)
+
+            start = time.perf_counter()
+            self.checkpoint.write(rows)
+            self.stats.record("checkpoint", len(rows), time.perf_counter() - start)
+
+            self._pending_rows += len(rows)
+            if self._pending_rows >= self.commit_rows:
+                self.commit()
+
+    # Appends the checkpointed articles to the store, brings the index up to date with the store, then drops the
+    # parts. Safe to repeat after a crash at any point: articles already in the store or index are not added again.
+    def commit(self):
+        parts = self.checkpoint.parts()
+        if parts:
+            rows = self.checkpoint.load(parts).drop_duplicates(subset = ["id"])
+            start = time.perf_counter()
+            if self.store is None:
+                self.store = convert_dataframe_to_store(rows, self.store_dir)
+                self.stats.record("store", len(rows), time.perf_counter() - start)
+            else:
+                rows = rows[~np.isin(rows["id"].to_numpy(), self.store.ids)]
+                if len(rows):
+                    self.store = append_to_store(self.store, rows)
+                    self.stats.record("store", len(rows), time.perf_counter() - start)
+
+        if self.store is not None and (self.tfidf_index is None or not self.tfidf_index.matches(self.store)):
+            start = time.perf_counter()
+            # An index whose rows no longer point at the same articles is rebuilt, not appended to
+            if self.tfidf_index is None or not index_rows_match(self.tfidf_index, self.store):
+                self.tfidf_index = build_tfidf_index(self.store, self.index_dir, max_features = self.max_features)
+                added = len(self.tfidf_index)
+            else:
+                previous_rows = len(self.tfidf_index)
+                self.tfidf_index = append_to_index(self.tfidf_index, self.index_dir, self.store)
+                added = len(self.tfidf_index) - previous_rows
+            self.stats.record("index", added, time.perf_counter() - start)
+
+        self.checkpoint.remove(parts)
+        self._pending_rows = 0
+
+def print_report(report):
+    for stage, stats in report["stages"].items():
+        rate = f"{stats['docs_per_second']:.1f} docs/s" if stats["docs_per_second"] else "-"
+        print(f"{stage:<11} {stats['docs']:>9} docs  {stats['seconds']:>9.2f} s  {rate}")
+    print(f"Skipped {report['skipped']} already processed articles, {report['wall_seconds']:.1f} s in total "
+          "(summarize & clean seconds are summed over workers)")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description = "Ingest raw POLUSA CSVs into the article store and TF-IDF index, incrementally.")
+    parser.add_argument("--input", nargs = "+", required = True, help = "Raw POLUSA CSV files (id, date_publish, outlet, headline, body, url, political_leaning)")
+    parser.add_argument("--store", default = DEFAULT_STORE_DIR)
+    parser.add_argument("--index", default = DEFAULT_INDEX_DIR)
+    parser.add_argument("--checkpoint-dir", default = DEFAULT_CHECKPOINT_DIR)
+    parser.add_argument("--workers", type = int, default = os.cpu_count())
+    parser.add_argument("--chunk-size", type = int, default = 500)
+    parser.add_argument("--commit-rows", type = int, default = 50_000)
+    parser.add_argument("--max-features", type = int, default = 50_000, help = "Used when the index is built from scratch (first run, or a store rebuilt under it)")
+    args = parser.parse_args()
+
+    ingestion = Ingestion(args.store, args.index, args.checkpoint_dir, args.workers, args.chunk_size, args.commit_rows, args.max_features)
+    print_report(ingestion.run(args.input))
@@ -0,0 +1,164 @@
+import json
+import time
+import sqlite3
+import threading
+import pandas as pd
+from collections import OrderedDict
+from backend.models.recommendation_function import recommend_articles_bias_controlled_batch
+
+# Identifies the data a recommendation was computed from; changes whenever the store or the index is rebuilt
+def dataset_version(store, tfidf_index):
+    return f"{store.version}:{tfidf_index.meta['built_at']}"
+
+def encode_recommendations(recommendations):
+    return json.dumps([recommendations.columns.tolist(), recommendations.to_numpy().tolist()], default = int)
+
+def decode_recommendations(encoded):
+    columns, data = json.loads(encoded)
+    return pd.DataFrame(data, columns = columns)
+
+# Seconds between two sweeps of the SQLite tier (expired rows, other dataset versions & rows over the bound)
+DISK_SWEEP_INTERVAL_SECONDS = 60
+
+# Two-tier cache of recommendation results: a bounded in-process LRU with TTL, backed by an optional SQLite
+# table shared by all workers. Keys cover the seed id, every recommender parameter and the dataset version,
+# so results from a previous build are never served; they are purged from disk when the cache is opened and
+# by a periodic sweep on writes, which also keeps the table within `max_disk_entries` (oldest rows first).
+class RecommendationCache:
+    def __init__(self, version, max_entries = 10_000, ttl_seconds = 24 * 3600, db_path = None, max_disk_entries = 100_000):
+        self.version = version
+        self.max_entries = max_entries
+        self.max_disk_entries = max_disk_entries
+        self.ttl_seconds = ttl_seconds
+        self.db_path = db_path
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "disk_hits": 0, "misses": 0, "evictions": 0, "expirations": 0, "disk_evictions": 0, "disk_expirations": 0}
+        self._conn = None
+        self._next_sweep = 0.0
+        if db_path:
+            self._open_db()
+
+    def _open_db(self):
+        self._conn = sqlite3.connect(self.db_path, timeout = 30, check_same_thread = False)
+        self._conn.execute("PRAGMA journal_mode = WAL")
+        self._conn.execute("PRAGMA synchronous = NORMAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS recommendation_cache (
+                key TEXT PRIMARY KEY,
+                version TEXT NOT NULL,
+                value TEXT NOT NULL,
+                created_at REAL NOT NULL
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_recommendation_cache_created_at ON recommendation_cache (created_at)")
+        self._sweep(time.time())
+
+    # Deletes expired rows & rows of other dataset versions, then the oldest rows over `max_disk_entries`
+    def _sweep(self, now):
+        self._stats["disk_expirations"] += self._conn.execute(
+            "DELETE FROM recommendation_cache WHERE version != ? OR created_at < ?",
+            (self.version, now - self.ttl_seconds),
+        ).rowcount
+        self._stats["disk_evictions"] += self._conn.execute("""
+            DELETE FROM recommendation_cache WHERE key IN (
+                SELECT key FROM recommendation_cache ORDER BY created_at DESC LIMIT -1 OFFSET ?
+            )
+        """, (self.max_disk_entries,)).rowcount
+        self._conn.commit()
+        self._next_sweep = now + DISK_SWEEP_INTERVAL_SECONDS
+
+    def key(self, article_id, primary_weight, top_n, base_days_window, max_days_window, policy, retriever = None):
+        return f"{self.version}|{int(article_id)}|{primary_weight}|{top_n}|{base_days_window}|{max_days_window}|{policy!r}|{retriever!r}"
+
+    def get(self, key):
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                created_at, value = entry
+                if now - created_at <= self.ttl_seconds:
+                    self._entries.move_to_end(key)
+                    self._stats["hits"] += 1
+                    return value.copy()
+                del self._entries[key]
+                self._stats["expirations"] += 1
+
+            if self._conn is not None:
+                row = self._conn.execute(
+                    "SELECT value, created_at FROM recommendation_cache WHERE key = ? AND created_at >= ?",
+                    (key, now - self.ttl_seconds),
+                ).fetchone()
+                if row:
+                    value = decode_recommendations(row[0])
+                    self._remember(key, value, row[1])
+                    self._stats["disk_hits"] += 1
+                    return value.copy()
+
+            self._stats["misses"] += 1
+            return None
+
+    def put(self, key, value):
+        self.put_many({key: value})
+
+    def put_many(self, values):
+        now = time.time()
+        with self._lock:
+            for key, value in values.items():
+                self._remember(key, value, now)
+
+            if self._conn is not None and values:
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO recommendation_cache (key, version, value, created_at) VALUES (?, ?, ?, ?)",
+                    [(key, self.version, encode_recommendations(value), now) for key, value in values.items()],
+                )
+                self._conn.commit()
+                if now >= self._next_sweep:
+                    self._sweep(now)
+
+    def _remember(self, key, value, created_at):
+        self._entries[key] = (created_at, value.copy())
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last = False)
+            self._stats["evictions"] += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            if self._conn is not None:
+                self._conn.execute("DELETE FROM recommendation_cache")
+                self._conn.commit()
+
+    def stats(self):
+        with self._lock:
+            lookups = self._stats["hits"] + self._stats["disk_hits"] + self._stats["misses"]
+            return {
+                **self._stats,
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "max_disk_entries": self.max_disk_entries,
+                "hit_rate": (self._stats["hits"] + self._stats["disk_hits"]) / lookups if lookups else 0.0,
+                "version": self.version,
+            }
+
+    # Cached version of `recommend_articles_bias_controlled_batch`: only seeds missing from the cache are computed
+    def recommend_batch(self, article_ids, store, tfidf_index, primary_weight = 2, top_n = 5, base_days_window = 5, max_days_window = 10, policy = None, retriever = None):
+        results, missing = {}, {}
+        for article_id in dict.fromkeys(article_ids):
+            key = self.key(article_id, primary_weight, top_n, base_days_window, max_days_window, policy, retriever)
+            cached = self.get(key)
+            if cached is None:
+                missing[article_id] = key
+            else:
+                results[article_id] = cached
+
+        if missing:
+            computed = recommend_articles_bias_controlled_batch(
+                list(missing), store, tfidf_index, primary_weight = primary_weight, top_n = top_n,
+                base_days_window = base_days_window, max_days_window = max_days_window, policy = policy, retriever = retriever,
+            )
+            self.put_many({missing[article_id]: recommendations for article_id, recommendations in computed.items()})
+            results.update(computed)
+
+        return results
@@ -1,8 +1,10 @@
+import numpy as np
 import pandas as pd
 from collections import Counter
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.neighbors import NearestNeighbors
+from backend.models.reranking import QuotaPolicy, leaning_codes, rerank_candidates
+from backend.models.retrieval import ExactSparseRetriever
 
+# DataFrame reference implementations of the re-ranking stage (the recommender uses `backend.models.reranking`)
 def fairness_re_ranking(recommendations, max_per_outlet = 2):
     outlet_counts = Counter()
     balanced_recommendations = []
@@ -45,54 +47,86 @@ def enforce_political_diversity(recommendations, primary_weight, top_n = 5):
 
     return pd.DataFrame(selected_articles).reset_index(drop=True)
 
-def recommend_articles_bias_controlled(article_id, df, primary_weight = 2, top_n = 5, base_days_window = 5, max_days_window = 10):
-    # Step 1: Get reference date & adaptively filter articles within the rolling window
-    reference_date = pd.to_datetime(df.loc[df['id'] == article_id, 'date_publish']).values[0]
-    reference_date = pd.to_datetime(reference_date).date()
-
-    min_date = reference_date - pd.Timedelta(days = base_days_window)
-    max_date = reference_date + pd.Timedelta(days = base_days_window)
-
-    df['date_only'] = pd.to_datetime(df['date_publish']).dt.date
-    time_filtered_df = df[(df['date_only'] >= min_date) & (df['date_only'] <= max_date)].copy()
-    
-    # Expand window if too few articles exist
-    while len(time_filtered_df) < top_n * 3 and (max_date - reference_date).days < max_days_window:
-        min_date -= pd.Timedelta(days = 1)
-        max_date += pd.Timedelta(days = 1)
-        time_filtered_df = df[(df['date_only'] >= min_date) & (df['date_only'] <= max_date)].copy()
-
-    time_filtered_df = time_filtered_df.drop(columns = ['date_only']).reset_index(drop = True)
-
-    # Step 2: Handle case where too few articles exist
-    if len(time_filtered_df) < top_n:
-        return time_filtered_df[['id', 'date_publish', 'headline', 'outlet', 'url', 'political_leaning']].head(top_n)
-
-    # Step 3: Compute TF-IDF for time-filtered articles & fit Nearest Neighbors model
-    vectorizer = TfidfVectorizer(max_features = 50_000)
-    tfidf_filtered = vectorizer.fit_transform(time_filtered_df['text_cleaned'])
-
-    nn_filtered = NearestNeighbors(n_neighbors = min(top_n * 3, len(time_filtered_df)), metric = 'cosine', algorithm = 'auto', n_jobs = -1)
-    nn_filtered.fit(tfidf_filtered)
-
-    # Step 4: Find correct index of article in filtered dataset
-    idx_filtered = time_filtered_df.index[time_filtered_df['id'] == article_id].tolist()
-    if not idx_filtered:
-        return pd.DataFrame()
-    idx_filtered = idx_filtered[0]
-
-    # Step 5: Query Nearest Neighbors model (Get More Than Needed)
-    distances, indices = nn_filtered.kneighbors(tfidf_filtered[idx_filtered])
-    recommended_articles = time_filtered_df.iloc[indices[0][1:top_n * 3]].copy().reset_index(drop = True)
-
-    # Step 6: Apply Political Diversity First
-    recommended_articles = enforce_political_diversity(recommended_articles, top_n = top_n, primary_weight = primary_weight)
-
-    # Step 7: Apply Fairness Re-Ranking (Prevent Outlet Dominance)
-    recommended_articles = fairness_re_ranking(recommended_articles)
-
-    # Step 8: Final Selection (Pick Top-N)
-    recommended_articles = recommended_articles.head(top_n)
-    recommended_articles = recommended_articles[['id', 'date_publish', 'headline', 'outlet', 'url', 'political_leaning']]
-    
-    return recommended_articles
\ No newline at end of file
+RECOMMENDATION_COLUMNS = ['id', 'date_publish', 'headline', 'outlet', 'url', 'political_leaning']
+
+# Adaptively selects the rolling window around a seed, expanding it if too few articles exist
+def select_window(tfidf_index, position, top_n = 5, base_days_window = 5, max_days_window = 10):
+    reference_day = tfidf_index.days[position]
+
+    days_window = base_days_window
+    lo, hi = tfidf_index.window(reference_day - days_window, reference_day + days_window)
+
+    while hi - lo < top_n * 3 and days_window < max_days_window:
+        days_window += 1
+        lo, hi = tfidf_index.window(reference_day - days_window, reference_day + days_window)
+
+    return lo, hi
+
+# Steps 1-3 of the recommender, before re-ranking: returns the seeds that were searched with their candidate rows &
+# similarities, and the rows of the seeds that were not (None for unknown articles, a short window's rows otherwise)
+def retrieve_candidates(article_ids, tfidf_index, top_n = 5, base_days_window = 5, max_days_window = 10, retriever = None):
+    if retriever is None:
+        retriever = ExactSparseRetriever(tfidf_index)
+    direct = {}
+
+    # Step 1: Locate every seed in the date-sorted index & select its rolling window
+    seeds, positions, windows = [], [], []
+    for article_id in dict.fromkeys(article_ids):
+        position = tfidf_index.position(article_id)
+        if position is None:
+            direct[article_id] = None
+            continue
+
+        lo, hi = select_window(tfidf_index, position, top_n, base_days_window, max_days_window)
+
+        # Handle case where too few articles exist
+        if hi - lo < top_n:
+            direct[article_id] = np.sort(tfidf_index.rows[lo:hi])[:top_n]
+            continue
+
+        seeds.append(article_id)
+        positions.append(position)
+        windows.append((lo, hi))
+
+    # Step 2: Retrieve the nearest neighbors of every seed within its window (exact sparse products by default)
+    neighbors = retriever.search(positions, windows, top_n * 3)
+
+    # Step 3: Keep the nearest neighbors (Get More Than Needed), skipping the seed itself
+    candidate_rows = [tfidf_index.rows[nearest[1:]] for nearest, _ in neighbors]
+    candidate_scores = [scores[1:] for _, scores in neighbors]
+
+    return seeds, candidate_rows, candidate_scores, direct
+
+def recommend_articles_bias_controlled_batch(article_ids, store, tfidf_index, primary_weight = 2, top_n = 5, base_days_window = 5, max_days_window = 10, policy = None, retriever = None):
+    if policy is None:
+        policy = QuotaPolicy(primary_weight)
+
+    seeds, candidate_rows, candidate_scores, direct = retrieve_candidates(
+        article_ids, tfidf_index, top_n, base_days_window, max_days_window, retriever,
+    )
+    results = {
+        article_id: pd.DataFrame() if rows is None else store.frame(rows, RECOMMENDATION_COLUMNS)
+        for article_id, rows in direct.items()
+    }
+
+    # Step 4: Political diversity, outlet fairness & final Top-N selection, for all seeds at once
+    leaning_map = leaning_codes(store.categories("political_leaning"))
+    leanings, outlets = store.codes("political_leaning"), store.codes("outlet")
+    selected = rerank_candidates(
+        candidate_rows,
+        [leaning_map[leanings[rows]] for rows in candidate_rows],
+        [outlets[rows] for rows in candidate_rows],
+        candidate_scores,
+        policy = policy,
+        top_n = top_n,
+    )
+    for article_id, rows in zip(seeds, selected):
+        results[article_id] = store.frame(rows, RECOMMENDATION_COLUMNS)
+
+    return {article_id: results[article_id] for article_id in dict.fromkeys(article_ids)}
+
+def recommend_articles_bias_controlled(article_id, store, tfidf_index, primary_weight = 2, top_n = 5, base_days_window = 5, max_days_window = 10, policy = None, retriever = None):
+    return recommend_articles_bias_controlled_batch(
+        [article_id], store, tfidf_index, primary_weight = primary_weight, top_n = top_n,
+        base_days_window = base_days_window, max_days_window = max_days_window, policy = policy, retriever = retriever,
+    )[article_id]
@@ -0,0 +1,146 @@
+import numpy as np
+
+LEANINGS = ["LEFT", "CENTER", "RIGHT"]
+LEFT, CENTER, RIGHT = range(len(LEANINGS))
+
+# Maps store category labels of `political_leaning` to canonical leaning codes (LEFT, CENTER, RIGHT first,
+# any other label gets its own code after them)
+def leaning_codes(labels):
+    codes, others = [], {}
+    for label in labels:
+        if label in LEANINGS:
+            codes.append(LEANINGS.index(label))
+        else:
+            codes.append(others.setdefault(label, len(LEANINGS) + len(others)))
+    return np.array(codes, dtype = np.int64)
+
+# Pads ragged candidate lists into a (batch, width) array
+def pad_candidates(lists, fill, dtype):
+    width = max((len(values) for values in lists), default = 0)
+    padded = np.full((len(lists), width), fill, dtype = dtype)
+    for i, values in enumerate(lists):
+        padded[i, :len(values)] = values
+    return padded
+
+# Number of items kept by `items[:limit]` out of `count` items (negative limits drop from the end, like pandas head)
+def slice_length(limit, count):
+    return np.where(limit >= 0, np.minimum(limit, count), np.maximum(count + limit, 0))
+
+# Rank (1-based) of each True entry among the True entries of its row
+def row_ranks(mask):
+    return np.cumsum(mask, axis = 1) * mask
+
+# Re-ranking policies return, for each candidate list, the candidate positions in their new order (-1 = dropped).
+# Outlet caps and the final Top-N cut are applied afterwards by `rerank_candidates`.
+class RerankingPolicy:
+    def order(self, leanings, outlets, scores, valid, top_n):
+        raise NotImplementedError
+
+# Leaning quotas: the primary leaning (of the closest candidate) gets `primary_weight` slots, the remaining
+# slots are split between the other two leanings with one extra for the first of them, then unused slots are
+# filled in similarity order. Same output as `enforce_political_diversity`.
+class QuotaPolicy(RerankingPolicy):
+    def __init__(self, primary_weight = 2):
+        self.primary_weight = primary_weight
+
+    def __repr__(self):
+        return f"QuotaPolicy(primary_weight={self.primary_weight})"
+
+    def order(self, leanings, outlets, scores, valid, top_n):
+        batch, width = leanings.shape
+        positions = np.broadcast_to(np.arange(width), (batch, width))
+
+        # Step 1: Determine primary & secondary leanings and their quotas
+        primary = leanings[:, 0]
+        secondary_first = np.where((primary == LEFT) | (primary == RIGHT), CENTER, LEFT)
+        secondary_second = np.where(primary == LEFT, RIGHT, np.where(primary == RIGHT, LEFT, RIGHT))
+        share = (top_n - self.primary_weight) // 2
+        quotas = [self.primary_weight, share + 1, share]
+
+        # Step 2: Take the first `quota` candidates of each leaning, in quota order
+        key = np.full((batch, width), 4 * width, dtype = np.int64)
+        selected = np.zeros((batch, width), dtype = bool)
+        for slot, (leaning, quota) in enumerate(zip((primary, secondary_first, secondary_second), quotas)):
+            mask = valid & (leanings == leaning[:, None])
+            keep = mask & (row_ranks(mask) <= slice_length(quota, mask.sum(axis = 1))[:, None])
+            key[keep] = slot * width + positions[keep]
+            selected |= keep
+
+        # Step 3: Fill the remaining slots in similarity order
+        remaining = valid & ~selected
+        fill_limit = slice_length(top_n - selected.sum(axis = 1), remaining.sum(axis = 1))
+        fill = remaining & (row_ranks(remaining) <= fill_limit[:, None])
+        key[fill] = 3 * width + positions[fill]
+
+        ordered = np.argsort(key, axis = 1, kind = "stable")
+        return np.where(np.take_along_axis(key, ordered, axis = 1) < 4 * width, ordered, -1)
+
+# Maximal Marginal Relevance: greedily picks the candidate maximizing
+# relevance_weight * score - (1 - relevance_weight) * (max similarity to the already picked ones),
+# where two articles are similar if they share leaning (weight `leaning_weight`) and/or outlet.
+class MMRPolicy(RerankingPolicy):
+    def __init__(self, relevance_weight = 0.7, leaning_weight = 0.5):
+        self.relevance_weight = relevance_weight
+        self.leaning_weight = leaning_weight
+
+    def __repr__(self):
+        return f"MMRPolicy(relevance_weight={self.relevance_weight}, leaning_weight={self.leaning_weight})"
+
+    def order(self, leanings, outlets, scores, valid, top_n):
+        batch, width = leanings.shape
+        batch_rows = np.arange(batch)
+        ordered = np.full((batch, width), -1, dtype = np.int64)
+        picked = np.zeros((batch, width), dtype = bool)
+        redundancy = np.zeros((batch, width))
+
+        for step in range(width):
+            marginal = self.relevance_weight * scores - (1 - self.relevance_weight) * redundancy
+            marginal[~valid | picked] = -np.inf
+            pick = np.argmax(marginal, axis = 1)
+            has_pick = np.isfinite(marginal[batch_rows, pick])
+            if not has_pick.any():
+                break
+
+            ordered[has_pick, step] = pick[has_pick]
+            picked[batch_rows[has_pick], pick[has_pick]] = True
+
+            similarity = (
+                self.leaning_weight * (leanings == leanings[batch_rows, pick][:, None])
+                + (1 - self.leaning_weight) * (outlets == outlets[batch_rows, pick][:, None])
+            )
+            redundancy = np.where(has_pick[:, None], np.maximum(redundancy, similarity), redundancy)
+
+        return ordered
+
+# Re-ranks a batch of candidate lists (each sorted by decreasing similarity) in one pass: applies the policy,
+# limits each outlet to `max_per_outlet` articles and keeps the Top-N. Returns the selected candidates per list.
+def rerank_candidates(candidates, leanings, outlets, scores, policy = None, top_n = 5, max_per_outlet = 2):
+    if policy is None:
+        policy = QuotaPolicy()
+    if not candidates:
+        return []
+
+    candidates = pad_candidates(candidates, -1, np.int64)
+    leanings = pad_candidates(leanings, -1, np.int64)
+    outlets = pad_candidates(outlets, -1, np.int64)
+    scores = pad_candidates(scores, -np.inf, np.float64)
+    valid = candidates >= 0
+
+    # Step 1: Policy ordering
+    ordered = policy.order(leanings, outlets, scores, valid, top_n)
+    kept = ordered >= 0
+    ordered_outlets = np.where(kept, np.take_along_axis(outlets, np.maximum(ordered, 0), axis = 1), -1)
+
+    # Step 2: Outlet caps, counting each outlet's occurrences in policy order
+    batch, width = ordered.shape
+    group = (np.arange(batch)[:, None] * (ordered_outlets.max(initial = 0) + 2) + ordered_outlets + 1).ravel()
+    by_group = np.argsort(group, kind = "stable")
+    starts = np.r_[True, group[by_group][1:] != group[by_group][:-1]]
+    occurrence = np.empty(batch * width, dtype = np.int64)
+    occurrence[by_group] = np.arange(batch * width) - np.maximum.accumulate(np.where(starts, np.arange(batch * width), 0))
+    kept &= occurrence.reshape(batch, width) < max_per_outlet
+
+    # Step 3: Final Selection (Pick Top-N)
+    kept &= row_ranks(kept) <= top_n
+
+    return [candidates[i, ordered[i][kept[i]]] for i in range(batch)]
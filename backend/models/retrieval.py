@@ -0,0 +1,238 @@
+import os
+import json
+import argparse
+import joblib
+import numpy as np
+from datetime import datetime
+from sklearn.decomposition import TruncatedSVD
+from sklearn.preprocessing import normalize
+from backend.models.tfidf_index import DEFAULT_INDEX_DIR, load_tfidf_index
+from backend.models.article_store import DEFAULT_STORE_DIR, load_article_store
+
+DEFAULT_DENSE_DIR = "backend/data/dense_index"
+
+RETRIEVERS = ("exact", "dense", "ann")
+
+# Seeds whose windows overlap are scored together, as long as their union stays below this many rows
+MAX_GROUP_ROWS = 100_000
+
+# Groups seed windows that overlap, returning (group_lo, group_hi, [seed indices]) tuples
+def group_windows(windows, max_group_rows = MAX_GROUP_ROWS):
+    groups = []
+    for i in sorted(range(len(windows)), key = lambda i: windows[i]):
+        lo, hi = windows[i]
+        if groups and lo < groups[-1][1] and max(hi, groups[-1][1]) - groups[-1][0] <= max_group_rows:
+            groups[-1][1] = max(hi, groups[-1][1])
+            groups[-1][2].append(i)
+        else:
+            groups.append([lo, hi, [i]])
+    return [tuple(group) for group in groups]
+
+# Positions of the `n_neighbors` most similar rows, most similar first, ties broken by date order
+def nearest_neighbors(similarities, n_neighbors):
+    nearest = np.argpartition(-similarities, n_neighbors - 1)[:n_neighbors]
+    return nearest[np.lexsort((nearest, -similarities[nearest]))]
+
+# Retrievers find, for each seed (a sorted index position) and its date window [lo, hi) of sorted positions,
+# the `n_neighbors` most similar rows of the window: (positions, scores), most similar first, the seed itself first.
+class Retriever:
+    def search(self, positions, windows, n_neighbors):
+        raise NotImplementedError
+
+# Scores each group of overlapping windows with one matrix-matrix product, then selects each seed's neighbors
+# within its own window. Exact for the vectors it is given.
+class BlockRetriever(Retriever):
+    max_group_rows = MAX_GROUP_ROWS
+
+    def scores(self, group_lo, group_hi, positions):
+        raise NotImplementedError
+
+    def search(self, positions, windows, n_neighbors):
+        results = [None] * len(positions)
+        for group_lo, group_hi, members in group_windows(windows, self.max_group_rows):
+            similarities = self.scores(group_lo, group_hi, [positions[i] for i in members])
+
+            for column, i in enumerate(members):
+                lo, hi = windows[i]
+
+                # The seed always ranks first, as its own nearest neighbor
+                window_similarities = similarities[lo - group_lo:hi - group_lo, column]
+                window_similarities[positions[i] - lo] = np.inf
+
+                nearest = nearest_neighbors(window_similarities, min(n_neighbors, hi - lo))
+                results[i] = (lo + nearest, window_similarities[nearest])
+        return results
+
+# Exact cosine similarity over the sparse TF-IDF rows (default)
+class ExactSparseRetriever(BlockRetriever):
+    def __init__(self, tfidf_index):
+        self.matrix = tfidf_index.matrix
+
+    def __repr__(self):
+        return "ExactSparseRetriever()"
+
+    def scores(self, group_lo, group_hi, positions):
+        return (self.matrix[group_lo:group_hi] @ self.matrix[positions].T).toarray()
+
+# Exact cosine similarity over dense reduced vectors (TruncatedSVD of the TF-IDF matrix or text embeddings)
+class DenseRetriever(BlockRetriever):
+    def __init__(self, vectors, name = "dense"):
+        self.vectors = vectors
+        self.name = name
+
+    def __repr__(self):
+        return f"DenseRetriever({self.name})"
+
+    def scores(self, group_lo, group_hi, positions):
+        return self.vectors[group_lo:group_hi] @ self.vectors[positions].T
+
+# Approximate search over dense vectors with a faiss IVF or HNSW index built offline. Rows are date-sorted, so a
+# date window is an id range and is filtered inside the search. Recall/speed knobs: `nprobe` (IVF lists visited),
+# `ef_search` (HNSW candidate list size) and `exact_below`: windows with fewer rows are searched exactly over the
+# same vectors, since a narrow id filter leaves the lists/graph too sparse for good recall and exact search is cheap there.
+# With `fallback`, searches that come back short of neighbors are also redone exactly.
+class FaissRetriever(Retriever):
+    def __init__(self, index, vectors, name = "ann", nprobe = 16, ef_search = 128, exact_below = 0, fallback = True):
+        self.index = index
+        self.vectors = vectors
+        self.name = name
+        self.nprobe = nprobe
+        self.ef_search = ef_search
+        self.exact_below = exact_below
+        self.fallback = fallback
+        self._exact = DenseRetriever(vectors, name)
+
+    def __repr__(self):
+        return f"FaissRetriever({self.name}, nprobe={self.nprobe}, ef_search={self.ef_search}, exact_below={self.exact_below}, fallback={self.fallback})"
+
+    def _search_parameters(self, selector):
+        import faiss
+
+        if faiss.try_extract_index_ivf(self.index) is not None:
+            return faiss.SearchParametersIVF(sel = selector, nprobe = self.nprobe)
+        return faiss.SearchParametersHNSW(sel = selector, efSearch = self.ef_search)
+
+    def search(self, positions, windows, n_neighbors):
+        import faiss
+
+        results = [None] * len(positions)
+        for i, (position, (lo, hi)) in enumerate(zip(positions, windows)):
+            if hi - lo < self.exact_below:
+                continue
+            query = np.ascontiguousarray(self.vectors[position:position + 1], dtype = np.float32)
+            selector = faiss.IDSelectorRange(lo, hi)
+            scores, neighbors = self.index.search(query, min(n_neighbors, hi - lo), params = self._search_parameters(selector))
+
+            # The seed always ranks first, as its own nearest neighbor
+            found = (neighbors[0] >= 0) & (neighbors[0] != position)
+            neighbors = np.r_[position, neighbors[0][found]][:n_neighbors].astype(np.int64)
+            if len(neighbors) == min(n_neighbors, hi - lo) or not self.fallback:
+                results[i] = (neighbors, np.r_[np.inf, scores[0][found]][:n_neighbors])
+
+        # Narrow windows, and searches that came back short of neighbors (with `fallback`), are searched exactly
+        exact = [i for i, result in enumerate(results) if result is None]
+        if exact:
+            for i, result in zip(exact, self._exact.search([positions[i] for i in exact], [windows[i] for i in exact], n_neighbors)):
+                results[i] = result
+        return results
+
+def build_dense_vectors(tfidf_index, dense_dir = DEFAULT_DENSE_DIR, method = "svd", n_components = 256, sample_size = 200_000, store = None, model_name = "all-MiniLM-L6-v2", batch_size = 50_000):
+    os.makedirs(dense_dir, exist_ok = True)
+    n_rows = len(tfidf_index)
+
+    if method == "svd":
+        # Fit on a sample of rows, then project the whole corpus in chunks
+        rng = np.random.default_rng(42)
+        sample = np.sort(rng.choice(n_rows, min(sample_size, n_rows), replace = False))
+        svd = TruncatedSVD(n_components = min(n_components, tfidf_index.matrix.shape[1] - 1), random_state = 42)
+        svd.fit(tfidf_index.matrix[sample])
+        vectors = np.vstack([
+            svd.transform(tfidf_index.matrix[start:start + batch_size]).astype(np.float32)
+            for start in range(0, n_rows, batch_size)
+        ])
+        joblib.dump(svd, os.path.join(dense_dir, "svd.joblib"))
+    elif method == "embedding":
+        from sentence_transformers import SentenceTransformer
+
+        texts = store.column("text_cleaned")
+        model = SentenceTransformer(model_name)
+        vectors = model.encode([texts[row] for row in tfidf_index.rows], batch_size = 256, convert_to_numpy = True).astype(np.float32)
+    else:
+        raise ValueError(f"Unknown dense vector method: {method}")
+
+    np.save(os.path.join(dense_dir, "vectors.npy"), normalize(vectors).astype(np.float32))
+    meta = {
+        "method": method,
+        "model_name": model_name if method == "embedding" else None,
+        "n_rows": n_rows,
+        "n_components": int(vectors.shape[1]),
+        "tfidf_built_at": tfidf_index.meta["built_at"],
+        "built_at": datetime.now().isoformat(timespec = "seconds"),
+    }
+    with open(os.path.join(dense_dir, "meta.json"), "w") as f:
+        json.dump(meta, f)
+    return meta
+
+def build_ann_index(dense_dir = DEFAULT_DENSE_DIR, kind = "hnsw", nlist = 1024, hnsw_m = 32, ef_construction = 200, train_size = 200_000):
+    import faiss
+
+    vectors = np.ascontiguousarray(np.load(os.path.join(dense_dir, "vectors.npy")))
+    n_rows, dimension = vectors.shape
+
+    if kind == "ivf":
+        quantizer = faiss.IndexFlatIP(dimension)
+        index = faiss.IndexIVFFlat(quantizer, dimension, min(nlist, n_rows), faiss.METRIC_INNER_PRODUCT)
+        rng = np.random.default_rng(42)
+        index.train(vectors[np.sort(rng.choice(n_rows, min(train_size, n_rows), replace = False))])
+    elif kind == "hnsw":
+        index = faiss.IndexHNSWFlat(dimension, hnsw_m, faiss.METRIC_INNER_PRODUCT)
+        index.hnsw.efConstruction = ef_construction
+    else:
+        raise ValueError(f"Unknown ANN index kind: {kind}")
+
+    index.add(vectors)  # Ids are the date-sorted index positions
+    faiss.write_index(index, os.path.join(dense_dir, f"{kind}.faiss"))
+    return index
+
+def load_dense_vectors(tfidf_index, dense_dir = DEFAULT_DENSE_DIR):
+    with open(os.path.join(dense_dir, "meta.json")) as f:
+        meta = json.load(f)
+    if meta["tfidf_built_at"] != tfidf_index.meta["built_at"]:
+        raise RuntimeError("Dense vectors are out of date with the TF-IDF index, rebuild them with `python -m backend.models.retrieval`")
+    return np.load(os.path.join(dense_dir, "vectors.npy"), mmap_mode = "r"), meta
+
+def load_retriever(tfidf_index, kind = "exact", dense_dir = DEFAULT_DENSE_DIR, ann = "ivf", nprobe = 16, ef_search = 128, exact_below = 0, fallback = True):
+    if kind == "exact":
+        return ExactSparseRetriever(tfidf_index)
+
+    vectors, meta = load_dense_vectors(tfidf_index, dense_dir)
+    if kind == "dense":
+        return DenseRetriever(vectors, name = meta["method"])
+    if kind == "ann":
+        import faiss
+
+        index = faiss.read_index(os.path.join(dense_dir, f"{ann}.faiss"))
+        return FaissRetriever(index, vectors, name = f"{meta['method']}-{ann}", nprobe = nprobe, ef_search = ef_search, exact_below = exact_below, fallback = fallback)
+    raise ValueError(f"Unknown retriever: {kind}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description = "Build the dense vectors and ANN index used by the dense/ann retrievers.")
+    parser.add_argument("--index", default = DEFAULT_INDEX_DIR)
+    parser.add_argument("--store", default = DEFAULT_STORE_DIR)
+    parser.add_argument("--output", default = DEFAULT_DENSE_DIR)
+    parser.add_argument("--method", choices = ["svd", "embedding"], default = "svd")
+    parser.add_argument("--components", type = int, default = 256)
+    parser.add_argument("--model", default = "all-MiniLM-L6-v2")
+    parser.add_argument("--ann", choices = ["ivf", "hnsw", "none"], default = "ivf")
+    parser.add_argument("--nlist", type = int, default = 1024)
+    parser.add_argument("--hnsw-m", type = int, default = 32)
+    args = parser.parse_args()
+
+    tfidf_index = load_tfidf_index(args.index)
+    store = load_article_store(args.store) if args.method == "embedding" else None
+    meta = build_dense_vectors(tfidf_index, args.output, method = args.method, n_components = args.components, store = store, model_name = args.model)
+    print(f"Built {meta['n_rows']} x {meta['n_components']} {args.method} vectors into {args.output}")
+
+    if args.ann != "none":
+        build_ann_index(args.output, kind = args.ann, nlist = args.nlist, hnsw_m = args.hnsw_m)
+        print(f"Built {args.ann} index into {args.output}")
@@ -0,0 +1,100 @@
+import os
+import json
+import argparse
+import joblib
+import numpy as np
+from datetime import datetime
+from scipy.sparse import csr_matrix
+from sklearn.feature_extraction.text import TfidfVectorizer
+from backend.models.article_store import DEFAULT_STORE_DIR, load_article_store, new_directory, replace_directory
+
+DEFAULT_INDEX_DIR = "backend/data/tfidf_index"
+
+# Holds the corpus TF-IDF matrix with rows sorted by publication day.
+# `rows[i]` is the article store row of the i-th sorted row.
+class TfidfIndex:
+    def __init__(self, matrix, days, ids, rows, meta):
+        self.matrix = matrix
+        self.days = days
+        self.ids = ids
+        self.rows = rows
+        self.meta = meta
+        self._id_order = np.argsort(ids, kind = "stable")
+        self._sorted_ids = ids[self._id_order]
+
+    def __len__(self):
+        return self.matrix.shape[0]
+
+    # Sorted position of an article id, or None if it is not indexed
+    def position(self, article_id):
+        i = np.searchsorted(self._sorted_ids, article_id)
+        if i == len(self._sorted_ids) or self._sorted_ids[i] != article_id:
+            return None
+        return int(self._id_order[i])
+
+    # Half-open range of sorted positions published between two day offsets (inclusive)
+    def window(self, min_day, max_day):
+        lo = np.searchsorted(self.days, min_day, side = "left")
+        hi = np.searchsorted(self.days, max_day, side = "right")
+        return int(lo), int(hi)
+
+    # Checks that the index was built from this exact article store
+    def matches(self, store):
+        return self.meta.get("store_version") == store.version
+
+def build_tfidf_index(store, index_dir = DEFAULT_INDEX_DIR, max_features = 50_000):
+    # Step 1: Sort rows by publication day (stable, so ties keep store order)
+    days = np.asarray(store.days)
+    rows = np.argsort(days, kind = "stable")
+
+    # Step 2: Vectorize the whole corpus once, in date-sorted order
+    texts = store.column("text_cleaned")
+    vectorizer = TfidfVectorizer(max_features = max_features, dtype = np.float32)
+    matrix = vectorizer.fit_transform(texts[row] for row in rows).tocsr()
+    matrix.sort_indices()
+
+    # Step 3: Persist CSR buffers as plain .npy files so they can be memory-mapped, in a new directory swapped in at the end
+    new_dir = new_directory(index_dir)
+    np.save(os.path.join(new_dir, "data.npy"), matrix.data)
+    np.save(os.path.join(new_dir, "indices.npy"), matrix.indices)
+    np.save(os.path.join(new_dir, "indptr.npy"), matrix.indptr)
+    np.save(os.path.join(new_dir, "days.npy"), days[rows])
+    np.save(os.path.join(new_dir, "ids.npy"), np.asarray(store.ids)[rows])
+    np.save(os.path.join(new_dir, "rows.npy"), rows.astype(np.int64))
+    joblib.dump(vectorizer, os.path.join(new_dir, "vectorizer.joblib"))
+
+    meta = {
+        "n_rows": int(matrix.shape[0]),
+        "n_features": int(matrix.shape[1]),
+        "store_version": store.version,
+        "built_at": datetime.now().isoformat(timespec = "seconds"),
+    }
+    with open(os.path.join(new_dir, "meta.json"), "w") as f:
+        json.dump(meta, f)
+
+    replace_directory(new_dir, index_dir)
+    return load_tfidf_index(index_dir)
+
+def load_tfidf_index(index_dir = DEFAULT_INDEX_DIR):
+    with open(os.path.join(index_dir, "meta.json")) as f:
+        meta = json.load(f)
+
+    def load(name):
+        return np.load(os.path.join(index_dir, name), mmap_mode = "r")
+
+    matrix = csr_matrix(
+        (load("data.npy"), load("indices.npy"), load("indptr.npy")),
+        shape = (meta["n_rows"], meta["n_features"]),
+        copy = False,
+    )
+    return TfidfIndex(matrix, np.asarray(load("days.npy")), np.asarray(load("ids.npy")), np.asarray(load("rows.npy")), meta)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description = "Build the persistent TF-IDF index used by the recommender.")
+    parser.add_argument("--store", default = DEFAULT_STORE_DIR)
+    parser.add_argument("--output", default = DEFAULT_INDEX_DIR)
+    parser.add_argument("--max-features", type = int, default = 50_000)
+    args = parser.parse_args()
+
+    index = build_tfidf_index(load_article_store(args.store), args.output, max_features = args.max_features)
+    print(f"Indexed {len(index)} articles ({index.meta['n_features']} features) into {args.output}")
@@ -288,7 +288,19 @@ app.post("/interactions", verifyToken, (req, res) => {
 
   db.run(query, [id, req.user.id, interaction_type, read_time_seconds || 0, localTime], function (err) {
     if (err) return res.status(500).json({ error: "Failed to store interaction" });
-    res.json({ success: true, message: "Interaction stored", interaction_id: this.lastID });
+    const interactionId = this.lastID;
+
+    // Enqueue a background job that precomputes recommendations for the new interaction (coalesced per user).
+    // The recommendation_jobs table is created by the Python API; enqueue failures never fail the request.
+    const enqueueQuery = `
+      INSERT OR IGNORE INTO recommendation_jobs (user_id, kind, status, created_at)
+      VALUES (?, 'warm', 'queued', ?)
+    `;
+    db.run(enqueueQuery, [req.user.id, Date.now() / 1000], (err) => {
+      if (err) console.error("Failed to enqueue recommendation job:", err.message);
+    });
+
+    res.json({ success: true, message: "Interaction stored", interaction_id: interactionId });
   });
 });
 
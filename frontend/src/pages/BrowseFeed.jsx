@@ -310,9 +310,28 @@ const BrowseFeed = ({ setReportRefreshTrigger }) => {
           throw new Error(errorData.error || "Failed to generate recommendations.");
         }
   
-        const result = await response.json();
-  
-        if (result.success && result.recommendations.length > 0) {
+        // Recommendations are generated in the background: poll the job until it finishes
+        const { job_id } = await response.json();
+        let result = { status: "queued" };
+        for (let attempt = 0; attempt < 120 && ["queued", "running"].includes(result.status); attempt++) {
+          await new Promise((resolve) => setTimeout(resolve, 1000));
+          const jobResponse = await fetch(`${BACKEND_URL_API}/recommendations/jobs/${job_id}`, {
+            headers: { Authorization: `Bearer ${token}` },
+          });
+          result = await jobResponse.json();
+          if (!jobResponse.ok || result.status === "failed") {
+            throw new Error(result.error || "Failed to generate recommendations.");
+          }
+        }
+
+        // Still waiting for a worker after ~2 minutes: the job keeps running, the user can come back for it
+        if (["queued", "running"].includes(result.status)) {
+          setErrorMessage("Your recommendations are still being generated. Please try again in a few minutes.");
+          onErrorOpen();
+          return;
+        }
+
+        if (result.success && result.recommendations && result.recommendations.length > 0) {
           window.scrollTo({ top: 0, behavior: "smooth" });
           setTimeout(() => {
             (async () => {